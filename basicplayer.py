@@ -1,5 +1,9 @@
-import random
+import time
 import connectfour
+import evalcache
+import moveordering
+import searchstats
+import transposition
 
 Infinity = float('inf')
 
@@ -22,12 +26,8 @@ def basic_evaluate(board):
 		return -Infinity
 	score = board.longest_chain(board.get_current_player_id()) * 10
 	# Prefer having your pieces in the center of the board
-	for row in xrange(board.board_height):
-		for col in xrange(board.board_width):
-			if board.get_cell(row, col) == board.get_current_player_id():
-				score -= abs(board.board_width // 2 - col)
-			elif board.get_cell(row, col) == board.get_opposite_player_id():
-				score += abs(board.board_width // 2 - col)
+	score -= board.center_distance(board.get_current_player_id())
+	score += board.center_distance(board.get_opposite_player_id())
 	return score
 
 
@@ -42,10 +42,8 @@ def new_evaluate(board):
 	"""
 	if board.is_game_over():
 		return -Infinity
-	my_chain_groups = board.chain_groups(board.get_current_player_id())
-	other_chain_groups = board.chain_groups(board.get_opposite_player_id())
-	return (sum(v * 2**k for k, v in my_chain_groups.items()) -
-		sum(v * 2**k for k, v in other_chain_groups.items()))
+	return (board.chain_group_score(board.get_current_player_id()) -
+		board.chain_group_score(board.get_opposite_player_id()))
 
 
 ##############################################
@@ -59,13 +57,29 @@ def get_all_next_moves(board):
 	Return a generator of all moves that the current player could take
 	from this position.
 	"""
-	for column in xrange(board.board_width):
+	for column in range(board.board_width):
 		try:
 			yield (column, board.do_move(column))
 		except connectfour.InvalidMoveException:
 			pass
 
 
+def skip_mirrored_moves(get_next_moves_fn):
+	"""
+	Return a 'get_next_moves_fn' that returns the moves of get_next_moves_fn,
+	except that on a board that is its own mirror image, the moves in the
+	right half of the board are left out, since each one leads to the mirror
+	image of the board after a move in the left half.
+	"""
+	def get_next_moves(board):
+		next_moves = get_next_moves_fn(board)
+		if not board.is_symmetric():
+			return next_moves
+		return [(column, new_board) for column, new_board in next_moves
+			if 2 * column < board.board_width]
+	return get_next_moves
+
+
 def is_terminal(board):
 	"""
 	'is_terminal_fn' for game boards.
@@ -82,6 +96,9 @@ def is_terminal(board):
 class Node(object):
 	"""Store a node in a Connect Four game search tree."""
 
+	# Searches create a node for every position, so nodes have no __dict__
+	__slots__ = ('score', 'column')
+
 	def __init__(self, score, column=None):
 		"""Initialize this game tree node."""
 		self.score = score
@@ -99,37 +116,100 @@ class Node(object):
 		"""Return this node with a negated score."""
 		return Node(-self.score, self.column)
 
-	def __cmp__(self, other):
-		"""Return the comparison of this node with another one (1, 0, or -1)."""
-		return cmp(self.score, other.score) or cmp(self.column is not None,
-			other.column is not None)
+	# Nodes compare by score, and then by whether they have a column, so that
+	# of two nodes with the same score, the one with a move is greater
+
+	def __eq__(self, other):
+		"""Return whether this node compares equal to another one."""
+		return (self.score == other.score and
+			(self.column is None) == (other.column is None))
+
+	def __ne__(self, other):
+		"""Return whether this node does not compare equal to another one."""
+		return not self == other
+
+	def __lt__(self, other):
+		"""Return whether this node is less than another one."""
+		return ((self.score, self.column is not None) <
+			(other.score, other.column is not None))
+
+	def __le__(self, other):
+		"""Return whether this node is less than or equal to another one."""
+		return ((self.score, self.column is not None) <=
+			(other.score, other.column is not None))
+
+	def __gt__(self, other):
+		"""Return whether this node is greater than another one."""
+		return ((self.score, self.column is not None) >
+			(other.score, other.column is not None))
+
+	def __ge__(self, other):
+		"""Return whether this node is greater than or equal to another one."""
+		return ((self.score, self.column is not None) >=
+			(other.score, other.column is not None))
+
+	# Nodes compare by value, but are mutable
+	__hash__ = None
 
 
 minimax_nodesExpanded = 0
+minimax_tableHits = 0
+minimax_tableMisses = 0
+minimax_tableCollisions = 0
 
 def minimax(board, depth, increment,
 	eval_fn=basic_evaluate,
 	get_next_moves_fn=get_all_next_moves,
-	is_terminal_fn=is_terminal):
+	is_terminal_fn=is_terminal,
+	transposition_table=None,
+	stats=None,
+	symmetry=False):
 	"""
 	Do a minimax search on the specified board to the specified depth.
 	Return the column that the search finds to add a token to.
 
 	If increment is True, increment the global variable minimax_nodesExpanded
-	for every node that gets expanded.
+	for every node that gets expanded. (These global counters are kept for
+	backwards compatibility; pass a SearchStats as stats to get the counts
+	of this search alone.)
+
+	If a transposition_table is given, positions found in it are not searched
+	again, and the global variables minimax_tableHits, minimax_tableMisses and
+	minimax_tableCollisions are incremented by the table's lookup counts.
+
+	If symmetry is True, only one of each pair of mirrored moves is searched
+	on boards that are their own mirror image (see skip_mirrored_moves).
 	"""
+	global minimax_tableHits, minimax_tableMisses, minimax_tableCollisions
+	start = time.time()
+	if symmetry:
+		get_next_moves_fn = skip_mirrored_moves(get_next_moves_fn)
+	if transposition_table is not None:
+		transposition_table.new_search()
+		table_counters = transposition_table.get_counters()
 	node = minimax_helper(board, depth, increment,
-		eval_fn, get_next_moves_fn, is_terminal_fn)
+		eval_fn, get_next_moves_fn, is_terminal_fn, transposition_table, stats)
+	if transposition_table is not None:
+		hits, misses, collisions = _count_table_lookups(transposition_table,
+			table_counters, stats)
+		if increment:
+			minimax_tableHits += hits
+			minimax_tableMisses += misses
+			minimax_tableCollisions += collisions
+	_count_search(stats, depth, start)
 	return node.column
 
 def minimax_helper(board, depth, increment,
-	eval_fn, get_next_moves_fn, is_terminal_fn):
+	eval_fn, get_next_moves_fn, is_terminal_fn, transposition_table=None,
+	stats=None, ply=0):
 	"""
 	Do a recursive minimax search on the specified board to the specified depth.
 	Return the node with the best score and the corresponding column move.
 
 	If increment is True, increment the global variable minimax_nodesExpanded
-	for every node that gets expanded.
+	for every node that gets expanded. If stats is a SearchStats, count the
+	nodes, leaves and terminal positions in it; the ply is the distance of
+	this board from the root of the search.
 
 	Since Connect Four is a zero-sum game, taking the minimum score on alternate
 	levels of the search tree can be replaced by taking the maximum of the
@@ -138,37 +218,104 @@ def minimax_helper(board, depth, increment,
 	global minimax_nodesExpanded
 	if increment:
 		minimax_nodesExpanded += 1
+	if stats is not None:
+		stats.count_node(ply)
 	if depth <= 0 or is_terminal_fn(board):
+		if stats is not None:
+			_count_leaf(stats, depth)
 		return Node(eval_fn(board))
+	if transposition_table is not None:
+		entry = transposition_table.lookup(board)
+		if entry is not None and entry.depth >= depth:
+			return Node(entry.score, entry.move)
 	best_node = Node(-Infinity)
 	for column, new_board in get_next_moves_fn(board):
 		child_node = -minimax_helper(new_board, depth - 1, increment,
-			eval_fn, get_next_moves_fn, is_terminal_fn)
+			eval_fn, get_next_moves_fn, is_terminal_fn, transposition_table,
+			stats, ply + 1)
 		if child_node > best_node:
 			best_node = Node(child_node.score, column)
+	if transposition_table is not None:
+		transposition_table.store(board, depth, best_node.score,
+			transposition.EXACT, best_node.column)
 	return best_node
 
 
 alpha_beta_nodesExpanded = 0
+alpha_beta_tableHits = 0
+alpha_beta_tableMisses = 0
+alpha_beta_tableCollisions = 0
 
 def alpha_beta_search(board, depth, increment,
 	eval_fn=new_evaluate,
 	get_next_moves_fn=get_all_next_moves,
-	is_terminal_fn=is_terminal):
+	is_terminal_fn=is_terminal,
+	transposition_table=None,
+	move_orderer=None,
+	stats=None,
+	symmetry=False,
+	pvs=False,
+	aspiration_window=None,
+	guess=None):
 	"""
 	Do a minimax search with alpha-beta pruning on the specified board
 	to the specified depth.
 	Return the column that the search finds to add a token to.
 
 	If increment is True, increment the global variable alpha_beta_nodesExpanded
-	for every node that gets expanded.
+	for every node that gets expanded. (These global counters are kept for
+	backwards compatibility; pass a SearchStats as stats to get the counts
+	of this search alone.)
+
+	If a transposition_table is given, it is used to cut off or narrow the
+	search of positions that have already been searched, and the global
+	variables alpha_beta_tableHits, alpha_beta_tableMisses and
+	alpha_beta_tableCollisions are incremented by the table's lookup counts.
+
+	If a move_orderer is given, it decides the order in which the moves
+	at each node are searched.
+
+	If symmetry is True, only one of each pair of mirrored moves is searched
+	on boards that are their own mirror image (see skip_mirrored_moves).
+
+	If pvs is True, do a principal variation search (see alpha_beta_helper).
+	If an aspiration_window is given, search a window of that width on
+	either side of guess, by default the board's evaluation, and widen it
+	if the score falls outside (see aspiration_search).
 	"""
-	node = alpha_beta_helper(board, depth, increment, -Infinity, Infinity,
-		eval_fn, get_next_moves_fn, is_terminal_fn)
+	global alpha_beta_tableHits, alpha_beta_tableMisses, alpha_beta_tableCollisions
+	start = time.time()
+	if symmetry:
+		get_next_moves_fn = skip_mirrored_moves(get_next_moves_fn)
+	if transposition_table is not None:
+		transposition_table.new_search()
+		table_counters = transposition_table.get_counters()
+	if move_orderer is not None:
+		move_orderer.new_search()
+	if aspiration_window is not None:
+		if guess is None:
+			guess = eval_fn(board)
+		node = aspiration_search(board, depth, increment, guess,
+			aspiration_window, eval_fn, get_next_moves_fn, is_terminal_fn,
+			transposition_table, move_orderer=move_orderer, stats=stats, pvs=pvs)
+	else:
+		node = alpha_beta_helper(board, depth, increment, -Infinity, Infinity,
+			eval_fn, get_next_moves_fn, is_terminal_fn, transposition_table,
+			move_orderer=move_orderer, stats=stats, pvs=pvs)
+	if transposition_table is not None:
+		hits, misses, collisions = _count_table_lookups(transposition_table,
+			table_counters, stats)
+		if increment:
+			alpha_beta_tableHits += hits
+			alpha_beta_tableMisses += misses
+			alpha_beta_tableCollisions += collisions
+	_count_search(stats, depth, start)
 	return node.column
 
 def alpha_beta_helper(board, depth, increment, alpha, beta,
-	eval_fn, get_next_moves_fn, is_terminal_fn):
+	eval_fn, get_next_moves_fn, is_terminal_fn, transposition_table=None,
+	deadline=None, pv=None, pv_line=None, move_orderer=None, ply=0,
+	stats=None, pvs=False):
 	"""
 	Do a recursive minimax search with alpha-beta pruning on the specified board
 	to the specified depth.
@@ -176,24 +323,260 @@ def alpha_beta_helper(board, depth, increment, alpha, beta,
 
 	If increment is True, increment the global variable alpha_beta_nodesExpanded
 	for every node that gets expanded.
+
+	Scores stored in the transposition table are exact if they fell inside
+	the (alpha, beta) window, and upper or lower bounds if they did not.
+
+	If a deadline (in seconds, as returned by time.time()) is given, raise
+	SearchTimeout when a node is reached after it has passed.
+
+	If pv is a list, it is filled in with the principal variation, the
+	sequence of best moves found from this board. If pv_line is a principal
+	variation from an earlier search, its moves are searched first.
+
+	If a move_orderer is given, the other moves are searched in its order,
+	and it is told about every cutoff. The ply is the distance of this board
+	from the root of the search.
+
+	If stats is a SearchStats, count the nodes, leaves, terminal positions
+	and cutoffs in it.
+
+	If pvs is True, do a principal variation search: every move after the
+	first is searched with a null (alpha, alpha + 1) window, which only tells
+	whether it is better than the best move so far, and searched again with
+	the full window if it is. This assumes that every score is an integer or
+	infinite, as those of basic_evaluate and new_evaluate are.
 	"""
 	global alpha_beta_nodesExpanded
 	if increment:
 		alpha_beta_nodesExpanded += 1
+	if stats is not None:
+		stats.count_node(ply)
+	if deadline is not None and time.time() >= deadline:
+		raise SearchTimeout()
 	if depth <= 0 or is_terminal_fn(board):
+		if stats is not None:
+			_count_leaf(stats, depth)
 		return Node(eval_fn(board))
+	hash_move = None
+	if transposition_table is not None:
+		entry = transposition_table.lookup(board)
+		if entry is not None:
+			hash_move = entry.move
+		if entry is not None and entry.depth >= depth:
+			if entry.bound == transposition.EXACT:
+				if pv is not None and entry.move is not None:
+					pv[:] = [entry.move]
+				return Node(entry.score, entry.move)
+			if entry.bound == transposition.LOWER_BOUND:
+				alpha = max(alpha, entry.score)
+			else:
+				beta = min(beta, entry.score)
+			if alpha >= beta:
+				return Node(entry.score, entry.move)
+	original_alpha = alpha
 	best_node = Node(-Infinity)
-	for column, new_board in get_next_moves_fn(board):
-		child_node = -alpha_beta_helper(new_board, depth - 1, increment,
-			-beta, -alpha, eval_fn, get_next_moves_fn, is_terminal_fn)
+	next_moves = get_next_moves_fn(board)
+	if move_orderer is not None:
+		next_moves = move_orderer.order(board, next_moves, ply, hash_move)
+	if pv_line:
+		next_moves = principal_variation_first(next_moves, pv_line[0])
+	for index, (column, new_board) in enumerate(next_moves):
+		child_pv = [] if pv is not None else None
+		child_pv_line = pv_line[1:] if pv_line and column == pv_line[0] else None
+		if pvs and index > 0 and alpha != -Infinity:
+			child_node = -alpha_beta_helper(new_board, depth - 1, increment,
+				-alpha - 1, -alpha, eval_fn, get_next_moves_fn, is_terminal_fn,
+				transposition_table, deadline, child_pv, child_pv_line,
+				move_orderer, ply + 1, stats, pvs)
+			if alpha < child_node.score < beta:
+				if stats is not None:
+					stats.re_searches += 1
+				child_node = -alpha_beta_helper(new_board, depth - 1, increment,
+					-beta, -alpha, eval_fn, get_next_moves_fn, is_terminal_fn,
+					transposition_table, deadline, child_pv, child_pv_line,
+					move_orderer, ply + 1, stats, pvs)
+		else:
+			child_node = -alpha_beta_helper(new_board, depth - 1, increment,
+				-beta, -alpha, eval_fn, get_next_moves_fn, is_terminal_fn,
+				transposition_table, deadline, child_pv, child_pv_line,
+				move_orderer, ply + 1, stats, pvs)
 		if child_node > best_node:
 			best_node = Node(child_node.score, column)
+			if pv is not None:
+				pv[:] = [column] + child_pv
 			alpha = max(alpha, best_node.score)
 			if alpha >= beta:
+				if stats is not None:
+					stats.cutoffs += 1
+				if move_orderer is not None:
+					move_orderer.record_cutoff(column, ply, depth, index)
 				break
+	if transposition_table is not None:
+		if best_node.score <= original_alpha:
+			bound = transposition.UPPER_BOUND
+		elif best_node.score >= beta:
+			bound = transposition.LOWER_BOUND
+		else:
+			bound = transposition.EXACT
+		transposition_table.store(board, depth, best_node.score, bound,
+			best_node.column)
 	return best_node
 
 
+def aspiration_search(board, depth, increment, guess, window,
+	eval_fn, get_next_moves_fn, is_terminal_fn, transposition_table=None,
+	deadline=None, pv=None, pv_line=None, move_orderer=None, stats=None,
+	pvs=False):
+	"""
+	Do an alpha-beta search of the specified board with an aspiration window,
+	(guess - window, guess + window), instead of the full window.
+	Return the node with the best score and the corresponding column move.
+
+	A narrower window cuts off more of the tree. If the score falls outside
+	the window, the side it fell out of is made four times wider (or
+	unbounded, if the score is infinite) and the board is searched again.
+	The other arguments are the same as those of alpha_beta_helper, and
+	re-searches are counted in stats.
+	"""
+	if abs(guess) == Infinity:
+		return alpha_beta_helper(board, depth, increment, -Infinity, Infinity,
+			eval_fn, get_next_moves_fn, is_terminal_fn, transposition_table,
+			deadline, pv, pv_line, move_orderer, stats=stats, pvs=pvs)
+	low_width = high_width = window
+	while True:
+		alpha = guess - low_width
+		beta = guess + high_width
+		node = alpha_beta_helper(board, depth, increment, alpha, beta,
+			eval_fn, get_next_moves_fn, is_terminal_fn, transposition_table,
+			deadline, pv, pv_line, move_orderer, stats=stats, pvs=pvs)
+		if node.score <= alpha and alpha != -Infinity:
+			low_width = low_width * 4 if node.score != -Infinity else Infinity
+		elif node.score >= beta and beta != Infinity:
+			high_width = high_width * 4 if node.score != Infinity else Infinity
+		else:
+			return node
+		if stats is not None:
+			stats.re_searches += 1
+
+
+def _count_leaf(stats, depth):
+	"""Count a leaf node in stats, which is terminal if depth is left."""
+	stats.leaf_evaluations += 1
+	if depth > 0:
+		stats.terminal_hits += 1
+
+
+def _count_table_lookups(transposition_table, counters_before, stats):
+	"""
+	Return the numbers of transposition table hits, misses and collisions
+	since the table's counters were counters_before, and add them to stats
+	if it is not None.
+	"""
+	hits, misses, collisions = [after - before for after, before in
+		zip(transposition_table.get_counters(), counters_before)]
+	if stats is not None:
+		stats.table_hits += hits
+		stats.table_misses += misses
+		stats.table_collisions += collisions
+	return hits, misses, collisions
+
+
+def _count_search(stats, depth, start):
+	"""
+	Count a finished search to the specified depth that started at the
+	specified time in stats, if it is not None.
+	"""
+	if stats is not None:
+		stats.searches += 1
+		stats.depth = max(stats.depth, depth)
+		stats.elapsed += time.time() - start
+
+
+def principal_variation_first(next_moves, pv_move):
+	"""
+	Return the moves from next_moves, with the principal variation move
+	first and the rest in their original order.
+	"""
+	next_moves = list(next_moves)
+	for i, (move, new_board) in enumerate(next_moves):
+		if move == pv_move:
+			return [next_moves[i]] + next_moves[:i] + next_moves[i+1:]
+	return next_moves
+
+
+class SearchTimeout(Exception):
+	"""Exception raised when a search runs past its deadline."""
+
+
+def iterative_deepening_search(board, time_limit, increment,
+	eval_fn=new_evaluate,
+	get_next_moves_fn=get_all_next_moves,
+	is_terminal_fn=is_terminal,
+	transposition_table=None,
+	max_depth=None,
+	move_orderer=None,
+	stats=None,
+	pvs=False,
+	aspiration_window=None):
+	"""
+	Do alpha-beta searches on the specified board to depths 1, 2, 3, and so on
+	until time_limit milliseconds have passed.
+	Return the column found by the deepest search that finished in time.
+
+	Each search tries the principal variation of the previous one first,
+	followed by the other moves in the order given by move_orderer, if any.
+	Searching stops early at max_depth (by default the number of empty cells),
+	or once a search finds a forced win or loss.
+
+	If increment is True, increment the global variable alpha_beta_nodesExpanded
+	for every node that gets expanded, including those of the unfinished search.
+	If stats is a SearchStats, count the nodes of every search in it, with the
+	depth of the deepest one that finished.
+
+	If pvs is True, each search is a principal variation search. If an
+	aspiration_window is given, each search after the first one searches
+	a window of that width around the score of the previous one.
+	"""
+	start = time.time()
+	deadline = start + time_limit / 1000.0
+	if max_depth is None:
+		max_depth = (board.board_width * board.board_height -
+			board.num_tokens_on_board())
+	if transposition_table is not None:
+		transposition_table.new_search()
+		table_counters = transposition_table.get_counters()
+	if move_orderer is not None:
+		move_orderer.new_search()
+	best_node = None
+	best_depth = 0
+	pv = []
+	for depth in range(1, max(max_depth, 1) + 1):
+		new_pv = []
+		try:
+			# The depth 1 search always finishes, so there is always a move
+			if aspiration_window is not None and best_node is not None:
+				best_node = aspiration_search(board, depth, increment,
+					best_node.score, aspiration_window, eval_fn, get_next_moves_fn,
+					is_terminal_fn, transposition_table, deadline, new_pv, pv,
+					move_orderer, stats, pvs)
+			else:
+				best_node = alpha_beta_helper(board, depth, increment, -Infinity,
+					Infinity, eval_fn, get_next_moves_fn, is_terminal_fn,
+					transposition_table, deadline if depth > 1 else None, new_pv, pv,
+					move_orderer, stats=stats, pvs=pvs)
+		except SearchTimeout:
+			break
+		best_depth = depth
+		pv = new_pv
+		if abs(best_node.score) == Infinity or time.time() >= deadline:
+			break
+	if transposition_table is not None:
+		_count_table_lookups(transposition_table, table_counters, stats)
+	_count_search(stats, best_depth, start)
+	return best_node.column
+
+
 ##############################################
 # Players
 ##############################################
@@ -202,15 +585,15 @@ def alpha_beta_helper(board, depth, increment, alpha, beta,
 def human_player(board):
 	"""A Connect Four player callback that asks the user what to do."""
 	target = None
-	valid_targets = xrange(board.board_width)
+	valid_targets = range(board.board_width)
 	while True:
-		target = raw_input('Pick a column #: --> ')
+		target = input('Pick a column #: --> ')
 		try:
 			target = int(target)
 		except ValueError:
 			target = None
 		if target not in valid_targets:
-			print 'Please specify a valid integer column number'
+			print('Please specify a valid integer column number')
 		else:
 			break
 	return target
@@ -218,19 +601,99 @@ def human_player(board):
 
 def random_player(board):
 	"""A Connect Four player callback that picks a column at random."""
+	# Only imported here, since searches have no use for it
+	import random
 	return random.choice([move for move, new_board in get_all_next_moves(board)])
 
 
 def basic_player(board):
-	"""A Connect Four player callback that calls minimax with basic_evaluate."""
-	return minimax(board, depth=4, increment=False, eval_fn=basic_evaluate)
+	"""
+	A Connect Four player callback that calls minimax with basic_evaluate.
+	Return the column and the SearchStats of the search.
+	"""
+	stats = searchstats.SearchStats()
+	return minimax(board, depth=4, increment=False, eval_fn=basic_evaluate,
+		stats=stats), stats
 
 
 def new_player(board):
-	"""A Connect Four player callback that calls minimax with new_evaluate."""
-	return minimax(board, depth=4, increment=True, eval_fn=new_evaluate)
+	"""
+	A Connect Four player callback that calls minimax with new_evaluate.
+	Return the column and the SearchStats of the search.
+	"""
+	stats = searchstats.SearchStats()
+	return minimax(board, depth=4, increment=True, eval_fn=new_evaluate,
+		stats=stats), stats
 
 
 def alpha_beta_player(board):
-	"""A Connect Four player callback that calls alpha_beta_search with new_evaluate."""
-	return alpha_beta_search(board, depth=4, increment=True, eval_fn=new_evaluate)
+	"""
+	A Connect Four player callback that calls alpha_beta_search with new_evaluate.
+	Return the column and the SearchStats of the search.
+	"""
+	stats = searchstats.SearchStats()
+	return alpha_beta_search(board, depth=4, increment=True, eval_fn=new_evaluate,
+		stats=stats), stats
+
+
+def _attach_search_state(player, table, orderer, cache):
+	"""
+	Attach the transposition table, move orderer and EvalCache (or None)
+	of a player callback to it, with a new_game method that clears them.
+	"""
+	def new_game():
+		table.clear()
+		orderer.clear()
+		if cache is not None:
+			cache.clear()
+	player.transposition_table = table
+	player.move_orderer = orderer
+	player.eval_cache = cache
+	player.new_game = new_game
+
+
+def make_alpha_beta_player(depth=4, eval_fn=new_evaluate, table_size=2**16,
+	eval_cache_size=None):
+	"""
+	Return a Connect Four player callback that calls alpha_beta_search with
+	its own transposition table and move orderer, which persist from one move
+	to the next. ConnectFourRunner clears them at the start of every game.
+	If eval_cache_size is given, eval_fn is wrapped in an EvalCache of that
+	size, which is cleared along with them.
+	The callback returns the column and the SearchStats of the search.
+	"""
+	table = transposition.TranspositionTable(table_size)
+	orderer = moveordering.MoveOrderer()
+	cache = None
+	if eval_cache_size is not None:
+		eval_fn = cache = evalcache.EvalCache(eval_fn, eval_cache_size)
+	def player(board):
+		stats = searchstats.SearchStats()
+		return alpha_beta_search(board, depth=depth, increment=True,
+			eval_fn=eval_fn, transposition_table=table, move_orderer=orderer,
+			stats=stats), stats
+	_attach_search_state(player, table, orderer, cache)
+	return player
+
+
+def make_timed_player(time_limit=1000, eval_fn=new_evaluate, table_size=2**16,
+	eval_cache_size=None):
+	"""
+	Return a Connect Four player callback that calls iterative_deepening_search
+	with a budget of time_limit milliseconds per move and its own
+	transposition table and move orderer, and if eval_cache_size is given,
+	its own EvalCache.
+	The callback returns the column and the SearchStats of the search.
+	"""
+	table = transposition.TranspositionTable(table_size)
+	orderer = moveordering.MoveOrderer()
+	cache = None
+	if eval_cache_size is not None:
+		eval_fn = cache = evalcache.EvalCache(eval_fn, eval_cache_size)
+	def player(board):
+		stats = searchstats.SearchStats()
+		return iterative_deepening_search(board, time_limit, increment=True,
+			eval_fn=eval_fn, transposition_table=table, move_orderer=orderer,
+			stats=stats), stats
+	_attach_search_state(player, table, orderer, cache)
+	return player
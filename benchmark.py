@@ -0,0 +1,438 @@
+"""
+Benchmarks for the Connect Four engine.
+
+Run this module to time board operations, evaluation functions and searches
+on a fixed, seeded corpus of positions, on standard boards, on the larger
+variants in BOARD_SIZES and with the longest_streak_to_win rules, and to
+compare the results against a saved baseline:
+
+	python benchmark.py --output baseline.json
+	(change the engine)
+	python benchmark.py --compare baseline.json
+
+Results are written as JSON. For every benchmark they include the time per
+operation in nanoseconds, and for searches also the number of nodes expanded,
+nodes per second and, where tracemalloc is available, the peak memory
+allocated during the search. Comparing exits with status 1 if any benchmark
+got slower than the threshold or started expanding more nodes.
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import timeit
+import connectfour
+import basicplayer
+import searchstats
+import stepsearch
+
+try:
+	import tracemalloc
+except ImportError:
+	tracemalloc = None
+
+try:
+	import resource
+except ImportError:
+	resource = None
+
+
+# The phases of the game in the corpus, with the range of the number of
+# tokens on the board in each
+PHASES = (
+	('opening', 2, 8),
+	('midgame', 14, 22),
+	('endgame', 30, 38),
+)
+
+# The phases of the corpus of longest_streak_to_win boards, whose games
+# end after 20 tokens
+STREAK_PHASES = (
+	('opening', 2, 6),
+	('midgame', 8, 12),
+	('endgame', 14, 18),
+)
+
+BOARD_CLASSES = {
+	'tuple': connectfour.ConnectFourBoard,
+	'bitboard': connectfour.BitboardConnectFourBoard,
+}
+
+# The board variants to compare, as (width, height, chain length goal)
+BOARD_SIZES = (
+	(7, 6, 4),
+	(8, 7, 4),
+	(9, 7, 4),
+	(9, 7, 5),
+)
+
+
+##############################################
+# Corpus
+##############################################
+
+
+def make_position(rng, board_class, num_tokens, **board_args):
+	"""
+	Return a board with num_tokens tokens placed by random moves that
+	do not end the game.
+	"""
+	while True:
+		board = board_class(**board_args)
+		while board.num_tokens_on_board() < num_tokens:
+			columns = [column for column in range(board.board_width)
+				if board.get_top_of_column(column) >= 0]
+			board = board.do_move(columns[int(rng.random() * len(columns))])
+			if board.is_game_over():
+				break
+		else:
+			return board
+
+
+def make_corpus(seed=537, positions_per_phase=5,
+	board_class=connectfour.ConnectFourBoard, phases=PHASES, **board_args):
+	"""
+	Return a list of (phase, boards) pairs, with positions_per_phase boards
+	for each phase in phases. The same seed always gives the same corpus.
+	"""
+	# random.random() gives the same sequence on every Python version,
+	# unlike random.choice() and random.randint()
+	rng = random.Random(seed)
+	corpus = []
+	for phase, min_tokens, max_tokens in phases:
+		boards = []
+		for i in range(positions_per_phase):
+			num_tokens = min_tokens + int(rng.random() * (max_tokens - min_tokens + 1))
+			boards.append(make_position(rng, board_class, num_tokens, **board_args))
+		corpus.append((phase, boards))
+	return corpus
+
+
+##############################################
+# Measurements
+##############################################
+
+
+def time_calls(function, arguments, repeat, min_time=0.02):
+	"""
+	Call function once with each tuple in arguments, enough times over that
+	each measurement takes at least min_time seconds, and repeat that
+	measurement repeat times.
+	Return the fastest time per call in seconds.
+	"""
+	def measure(number):
+		start = timeit.default_timer()
+		for i in range(number):
+			for args in arguments:
+				function(*args)
+		return timeit.default_timer() - start
+	number = 1
+	elapsed = measure(number)
+	if elapsed < min_time:
+		number = int(min_time / max(elapsed, 1e-6)) + 1
+	best = min(measure(number) for i in range(repeat))
+	return best / number / len(arguments)
+
+
+def peak_memory(function, *args, **kwargs):
+	"""
+	Return the peak memory in bytes allocated while calling function,
+	or None if tracemalloc is not available.
+	"""
+	if tracemalloc is None:
+		return None
+	tracemalloc.start()
+	try:
+		function(*args, **kwargs)
+		return tracemalloc.get_traced_memory()[1]
+	finally:
+		tracemalloc.stop()
+
+
+def operation_result(seconds_per_op, ops):
+	"""Return the result entry of a timed operation."""
+	return {'ns_per_op': seconds_per_op * 1e9, 'ops': ops}
+
+
+def _next_moves(board):
+	"""Return the (board, column) pairs of every legal move on a board."""
+	return [(board, column) for column in range(board.board_width)
+		if board.get_top_of_column(column) >= 0]
+
+
+def _do_move_is_game_over(board, column):
+	"""Make a move and check whether it ended the game, as searches do."""
+	return board.do_move(column).is_game_over()
+
+
+##############################################
+# Benchmarks
+##############################################
+
+
+def benchmark_board_operations(corpus, repeat):
+	"""Time the board operations used by the evaluators and searches."""
+	results = {}
+	for phase, boards in corpus:
+		players = [(board, player_id) for board in boards for player_id in (1, 2)]
+		arrays = [([[board.get_cell(row, col) for col in range(board.board_width)]
+			for row in range(board.board_height)],) for board in boards]
+		board_class = type(boards[0])
+		moves = [args for board in boards for args in _next_moves(board)]
+		operations = (
+			('board_from_array', board_class, arrays),
+			('do_move', board_class.do_move, moves),
+			('do_move_is_game_over', _do_move_is_game_over, moves),
+			# do_move caches the winner, so is_win would only time a lookup
+			('find_winner', board_class._find_winner, [(board,) for board in boards]),
+			('longest_chain', board_class.longest_chain, players),
+			('chain_groups', board_class.chain_groups, players),
+		)
+		for name, function, arguments in operations:
+			results['%s/%s' % (name, phase)] = operation_result(
+				time_calls(function, arguments, repeat), len(arguments))
+	return results
+
+
+def benchmark_evaluators(corpus, repeat):
+	"""Time the evaluation functions."""
+	results = {}
+	for phase, boards in corpus:
+		arguments = [(board,) for board in boards]
+		for eval_fn in (basicplayer.basic_evaluate, basicplayer.new_evaluate):
+			results['%s/%s' % (eval_fn.__name__, phase)] = operation_result(
+				time_calls(eval_fn, arguments, repeat), len(arguments))
+	return results
+
+
+def search_result(search, boards, depth, repeat, **kwargs):
+	"""
+	Run search on each board to the specified depth.
+	Return the result entry of the searches.
+	"""
+	stats = searchstats.SearchStats()
+	for board in boards:
+		search(board, depth, False, stats=stats, **kwargs)
+	nodes = stats.get_nodes_expanded()
+	def run_search(board):
+		search(board, depth, False, **kwargs)
+	seconds_per_op = time_calls(run_search, [(board,) for board in boards],
+		repeat, min_time=0)
+	memory = [peak_memory(run_search, board) for board in boards]
+	return {
+		'ns_per_op': seconds_per_op * 1e9,
+		'ops': len(boards),
+		'nodes': nodes,
+		'nodes_per_sec': nodes / (seconds_per_op * len(boards)),
+		'peak_memory': max(memory) if None not in memory else None,
+	}
+
+
+def benchmark_board_sizes(board_class, seed, positions_per_phase, repeat,
+	depth):
+	"""
+	Time board operations and alpha_beta_search to the specified depth on
+	each of the BOARD_SIZES, with the positions of every phase together.
+	"""
+	results = {}
+	for width, height, chain_length_goal in BOARD_SIZES:
+		sized_class = connectfour.make_board_class(width, height, board_class)
+		corpus = make_corpus(seed, positions_per_phase, sized_class,
+			chain_length_goal=chain_length_goal)
+		boards = [board for phase, phase_boards in corpus for board in phase_boards]
+		variant = '%dx%d-connect%d' % (width, height, chain_length_goal)
+		arrays = [([[board.get_cell(row, col) for col in range(width)]
+			for row in range(height)], 1, chain_length_goal) for board in boards]
+		operations = (
+			('board_from_array', sized_class, arrays),
+			('do_move', sized_class.do_move,
+				[args for board in boards for args in _next_moves(board)]),
+			('longest_chain', sized_class.longest_chain,
+				[(board, player_id) for board in boards for player_id in (1, 2)]),
+		)
+		for name, function, arguments in operations:
+			results['%s/%s' % (name, variant)] = operation_result(
+				time_calls(function, arguments, repeat), len(arguments))
+		results['alpha_beta_search/d%d/%s' % (depth, variant)] = search_result(
+			basicplayer.alpha_beta_search, boards, depth, repeat,
+			eval_fn=basicplayer.new_evaluate)
+	return results
+
+
+def benchmark_streak_mode(board_class, seed, positions_per_phase, repeat,
+	minimax_depth, alpha_beta_depth):
+	"""
+	Time board operations, minimax and alpha_beta_search on boards with the
+	longest_streak_to_win rules.
+	"""
+	results = {}
+	corpus = make_corpus(seed, positions_per_phase, board_class, STREAK_PHASES,
+		longest_streak_to_win=True)
+	for phase, boards in corpus:
+		variant = 'streak-%s' % phase
+		moves = [args for board in boards for args in _next_moves(board)]
+		operations = (
+			('do_move', board_class.do_move, moves),
+			('do_move_is_game_over', _do_move_is_game_over, moves),
+			('longest_chain', board_class.longest_chain,
+				[(board, player_id) for board in boards for player_id in (1, 2)]),
+		)
+		for name, function, arguments in operations:
+			results['%s/%s' % (name, variant)] = operation_result(
+				time_calls(function, arguments, repeat), len(arguments))
+		results['minimax/d%d/%s' % (minimax_depth, variant)] = search_result(
+			basicplayer.minimax, boards, minimax_depth, repeat,
+			eval_fn=basicplayer.basic_evaluate)
+		results['alpha_beta_search/d%d/%s' % (alpha_beta_depth, variant)] = (
+			search_result(basicplayer.alpha_beta_search, boards, alpha_beta_depth,
+			repeat, eval_fn=basicplayer.new_evaluate))
+	return results
+
+
+# Variants of alpha_beta_search to compare with the plain search, as pairs
+# of a name and the keyword arguments that select the variant
+ALPHA_BETA_VARIANTS = (
+	('alpha_beta_search', {}),
+	('alpha_beta_search_pvs', {'pvs': True}),
+	('alpha_beta_search_aspiration', {'aspiration_window': 16}),
+)
+
+
+def benchmark_searches(corpus, repeat, minimax_depths, alpha_beta_depths):
+	"""
+	Time minimax and alpha_beta_search, the variants of alpha_beta_search
+	in ALPHA_BETA_VARIANTS and the same search with an explicit stack
+	(stepsearch.stepped_alpha_beta_search) at several depths.
+	"""
+	results = {}
+	for phase, boards in corpus:
+		for depth in minimax_depths:
+			results['minimax/d%d/%s' % (depth, phase)] = search_result(
+				basicplayer.minimax, boards, depth, repeat,
+				eval_fn=basicplayer.basic_evaluate)
+		for depth in alpha_beta_depths:
+			for name, kwargs in ALPHA_BETA_VARIANTS:
+				results['%s/d%d/%s' % (name, depth, phase)] = search_result(
+					basicplayer.alpha_beta_search, boards, depth, repeat,
+					eval_fn=basicplayer.new_evaluate, **kwargs)
+			results['stepped_alpha_beta_search/d%d/%s' % (depth, phase)] = (
+				search_result(stepsearch.stepped_alpha_beta_search, boards, depth,
+				repeat, eval_fn=basicplayer.new_evaluate))
+	return results
+
+
+def run_benchmarks(board_class=connectfour.ConnectFourBoard, seed=537,
+	positions_per_phase=5, repeat=5, minimax_depths=(1, 2, 3),
+	alpha_beta_depths=(2, 4, 6), size_depth=4):
+	"""Run every benchmark and return the results as a dictionary."""
+	corpus = make_corpus(seed, positions_per_phase, board_class)
+	results = {}
+	results.update(benchmark_board_operations(corpus, repeat))
+	results.update(benchmark_evaluators(corpus, repeat))
+	results.update(benchmark_searches(corpus, repeat, minimax_depths,
+		alpha_beta_depths))
+	results.update(benchmark_board_sizes(board_class, seed, positions_per_phase,
+		repeat, size_depth))
+	results.update(benchmark_streak_mode(board_class, seed, positions_per_phase,
+		repeat, max(minimax_depths), max(alpha_beta_depths)))
+	meta = {
+		'python': platform.python_version(),
+		'board_class': board_class.__name__,
+		'seed': seed,
+		'positions_per_phase': positions_per_phase,
+		'repeat': repeat,
+	}
+	if resource is not None:
+		# Kilobytes on Linux, bytes on macOS
+		meta['max_rss'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	return {'meta': meta, 'results': results}
+
+
+##############################################
+# Reporting
+##############################################
+
+
+def compare_results(baseline, current, threshold):
+	"""
+	Compare two sets of benchmark results.
+	Return a list of (name, message) pairs describing each regression:
+	a benchmark whose time per operation grew by more than the threshold
+	fraction, or that expanded more nodes than before.
+	"""
+	regressions = []
+	for name, old in sorted(baseline['results'].items()):
+		new = current['results'].get(name)
+		if new is None:
+			continue
+		change = new['ns_per_op'] / old['ns_per_op'] - 1 if old['ns_per_op'] else 0.0
+		if change > threshold:
+			regressions.append((name, '%.0f ns/op -> %.0f ns/op (%+.1f%%)' % (
+				old['ns_per_op'], new['ns_per_op'], change * 100)))
+		if new.get('nodes', 0) > old.get('nodes', 0):
+			regressions.append((name, '%d nodes -> %d nodes' % (
+				old['nodes'], new['nodes'])))
+	return regressions
+
+
+def format_results(results, baseline=None):
+	"""Return a printable table of benchmark results."""
+	lines = ['%-44s %14s %10s %12s %12s' % ('benchmark', 'ns/op', 'nodes',
+		'nodes/sec', 'change')]
+	for name, result in sorted(results['results'].items()):
+		change = ''
+		if baseline is not None and name in baseline['results']:
+			old = baseline['results'][name]['ns_per_op']
+			if old:
+				change = '%+.1f%%' % ((result['ns_per_op'] / old - 1) * 100)
+		lines.append('%-44s %14.0f %10s %12s %12s' % (name, result['ns_per_op'],
+			result.get('nodes', ''),
+			'%.0f' % result['nodes_per_sec'] if 'nodes_per_sec' in result else '',
+			change))
+	return '\n'.join(lines)
+
+
+def main(argv=None):
+	"""Run the benchmarks from the command line."""
+	parser = argparse.ArgumentParser(description='Benchmark the Connect Four engine.')
+	parser.add_argument('--board', choices=sorted(BOARD_CLASSES), default='tuple',
+		help='board implementation to benchmark')
+	parser.add_argument('--seed', type=int, default=537,
+		help='seed of the position corpus')
+	parser.add_argument('--positions', type=int, default=5,
+		help='number of positions per game phase')
+	parser.add_argument('--repeat', type=int, default=5,
+		help='number of times to repeat each timed operation')
+	parser.add_argument('--quick', action='store_true',
+		help='skip the deepest searches')
+	parser.add_argument('--output', help='file to write the results to')
+	parser.add_argument('--compare', help='baseline results file to compare with')
+	parser.add_argument('--threshold', type=float, default=0.10,
+		help='fraction by which a benchmark may slow down before it is '
+			'reported as a regression')
+	args = parser.parse_args(argv)
+
+	results = run_benchmarks(BOARD_CLASSES[args.board], args.seed, args.positions,
+		args.repeat, (1, 2) if args.quick else (1, 2, 3),
+		(2, 4) if args.quick else (2, 4, 6), 2 if args.quick else 4)
+	baseline = None
+	if args.compare:
+		with open(args.compare) as f:
+			baseline = json.load(f)
+	print(format_results(results, baseline))
+	if args.output:
+		with open(args.output, 'w') as f:
+			json.dump(results, f, indent=1, sort_keys=True)
+	if baseline is not None:
+		regressions = compare_results(baseline, results, args.threshold)
+		for name, message in regressions:
+			print('REGRESSION %s: %s' % (name, message))
+		if regressions:
+			return 1
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
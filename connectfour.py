@@ -16,6 +16,178 @@ class InvalidMoveException(Exception):
 		return str(self)
 
 
+# The directions that chains run in, as (row_step, col_step) pairs:
+# vertical, horizontal and the two diagonals
+DIRECTIONS = ((1, 0), (0, 1), (1, 1), (1, -1))
+
+# Cache of the BoardGeometry of each board size and goal
+_geometries = {}
+
+
+class BoardGeometry(object):
+	"""
+	Store the tables that board methods share for one board size and
+	chain length goal.
+
+	Cells are numbered by their index into the board's rows laid end to end,
+	so the cell at (row, col) has index row * board_width + col. The tables
+	are:
+
+	* cells: the (row, column) coordinates of each cell index
+	* win_lines: every line of chain_length_goal cells, horizontally,
+	  vertically or diagonally, as a tuple of (row, column) coordinates
+	* flat_win_lines: the same lines, as tuples of cell indexes
+	* lines_through_cells: for each cell index, the indexes into win_lines
+	  of the lines that contain that cell
+	* rays: for each cell index and each of the DIRECTIONS, a pair of
+	  tuples of the (row, column) coordinates of the cells reached by
+	  stepping from the cell forward and backward along that direction, up
+	  to the edge of the board
+	* board_lines: every line that runs from edge to edge along one of the
+	  DIRECTIONS, as tuples of cell indexes
+	* cell_bits, win_line_masks, bottom_mask and shifts: the cells, the win
+	  lines, the bottom cell of every column and the bit shifts that step
+	  along each of the DIRECTIONS, in the layout of BitboardConnectFourBoard
+
+	Get the geometry of a board size with get_board_geometry, which builds
+	it only once.
+	"""
+
+	def __init__(self, board_width, board_height, chain_length_goal):
+		"""Build the tables of a board size and goal."""
+		self.board_width = board_width
+		self.board_height = board_height
+		self.chain_length_goal = chain_length_goal
+		self.num_cells = board_width * board_height
+		self.center = board_width // 2
+		self.cells = tuple((row, col) for row in range(board_height)
+			for col in range(board_width))
+
+		lines = []
+		for row, col in self.cells:
+			for row_step, col_step in DIRECTIONS:
+				end_row = row + row_step * (chain_length_goal - 1)
+				end_col = col + col_step * (chain_length_goal - 1)
+				if 0 <= end_row < board_height and 0 <= end_col < board_width:
+					lines.append(tuple((row + row_step * k, col + col_step * k)
+						for k in range(chain_length_goal)))
+		self.win_lines = tuple(lines)
+		self.flat_win_lines = tuple(tuple(self.index(row, col) for row, col in line)
+			for line in self.win_lines)
+		cell_lines = [[] for i in range(self.num_cells)]
+		for i, line in enumerate(self.flat_win_lines):
+			for cell in line:
+				cell_lines[cell].append(i)
+		self.lines_through_cells = tuple(map(tuple, cell_lines))
+
+		self.rays = tuple(tuple((self._ray(row, col, row_step, col_step),
+			self._ray(row, col, -row_step, -col_step))
+			for row_step, col_step in DIRECTIONS) for row, col in self.cells)
+		# A line runs from each cell that has no neighbor behind it
+		self.board_lines = tuple((i,) + tuple(self.index(row, col)
+			for row, col in forward)
+			for i, cell_rays in enumerate(self.rays)
+			for forward, backward in cell_rays if not backward)
+
+		column_bits = board_height + 1
+		self.cell_bits = tuple(1 << (col * column_bits + board_height - 1 - row)
+			for row, col in self.cells)
+		self.win_line_masks = tuple(sum(self.cell_bits[cell] for cell in line)
+			for line in self.flat_win_lines)
+		self.bottom_mask = sum(1 << (col * column_bits)
+			for col in range(board_width))
+		# The distance in bits between neighboring cells along each of the
+		# DIRECTIONS
+		self.shifts = (1, column_bits, column_bits - 1, column_bits + 1)
+
+	def _ray(self, row, col, row_step, col_step):
+		"""
+		Return the coordinates of the cells reached by stepping from the
+		specified cell by (row_step, col_step) until the edge of the board.
+		"""
+		cells = []
+		row += row_step
+		col += col_step
+		while 0 <= row < self.board_height and 0 <= col < self.board_width:
+			cells.append((row, col))
+			row += row_step
+			col += col_step
+		return tuple(cells)
+
+	def index(self, row, col):
+		"""Return the index of the specified cell."""
+		return row * self.board_width + col
+
+	def __reduce__(self):
+		"""Pickle a geometry as its size, so unpickling uses the cached one."""
+		return (get_board_geometry,
+			(self.board_width, self.board_height, self.chain_length_goal))
+
+	def __repr__(self):
+		"""Return a string representation of this geometry."""
+		return 'BoardGeometry(%d, %d, %d)' % (self.board_width,
+			self.board_height, self.chain_length_goal)
+
+
+def get_board_geometry(board_width, board_height, chain_length_goal):
+	"""
+	Return the BoardGeometry of the specified board size and goal, building
+	it the first time it is needed.
+	"""
+	key = (board_width, board_height, chain_length_goal)
+	geometry = _geometries.get(key)
+	if geometry is None:
+		geometry = _geometries[key] = BoardGeometry(board_width, board_height,
+			chain_length_goal)
+	return geometry
+
+def get_win_lines(board_width, board_height, chain_length_goal):
+	"""
+	Return a tuple of every line of chain_length_goal cells on a board of the
+	specified size, horizontally, vertically or diagonally. Each line is a
+	tuple of (row, column) coordinates.
+
+	The lines are computed once for each board size and goal.
+	"""
+	return get_board_geometry(board_width, board_height,
+		chain_length_goal).win_lines
+
+def mirror_position_key(key, board_width, board_height):
+	"""
+	Return the position key (see ConnectFourBoard.position_key) of the mirror
+	image of the board with the specified position key.
+	"""
+	column_bits = board_height + 1
+	column_mask = (1 << column_bits) - 1
+	mirrored = 0
+	for col in range(board_width):
+		mirrored = (mirrored << column_bits) | (key & column_mask)
+		key >>= column_bits
+	return mirrored
+
+# Cache of the board classes made by make_board_class
+_board_classes = {}
+
+def make_board_class(board_width, board_height, base=None):
+	"""
+	Return a subclass of base (ConnectFourBoard by default) for boards of
+	the specified width and height. The same arguments always give the
+	same class.
+
+	The class is named after base and the size, such as ConnectFourBoard8x7,
+	and can be looked up by that name in this module (see __getattr__), so
+	that it and its boards can be pickled for worker processes.
+	"""
+	if base is None:
+		base = ConnectFourBoard
+	key = (board_width, board_height, base)
+	if key not in _board_classes:
+		_board_classes[key] = type('%s%dx%d' % (base.__name__, board_width,
+			board_height), (base,), {'board_width': board_width,
+			'board_height': board_height, '__slots__': ()})
+	return _board_classes[key]
+
+
 class ConnectFourBoard(object):
 	"""
 	Store a Connect Four board.
@@ -41,6 +213,12 @@ class ConnectFourBoard(object):
 	# Map of board ID numbers to display characters used to print the board
 	board_symbols = ['.', 'X', 'O']
 
+	# Searches create a board for every position, so boards have no __dict__
+	__slots__ = ('_board_array', '_current_player', '_chain_length_goal',
+		'_longest_streak_to_win', '_geometry', '_last_move', '_winner',
+		'_line_counts', '_chain_groups', '_chain_group_scores',
+		'_center_distances', '_longest_chains', '_num_tokens')
+
 	def __init__(self, board_array=None, current_player=1,
 		chain_length_goal=4, longest_streak_to_win=False):
 		"""
@@ -61,18 +239,180 @@ class ConnectFourBoard(object):
 		self._current_player = current_player
 		self._chain_length_goal = chain_length_goal
 		self._longest_streak_to_win = longest_streak_to_win
+		self._geometry = get_board_geometry(self.board_width, self.board_height,
+			chain_length_goal)
+		# The (row, column) of the last token placed by do_move, if any
+		self._last_move = None
+		# The cached result of is_win, or None if it has not been computed;
+		# do_move fills it in from the last move so the full scan is skipped
+		self._winner = None
+		self._compute_evaluation_state()
+
+	def _new_board(self, current_player):
+		"""
+		Return a new board of the same kind and rules as this one, to be
+		filled in by do_move or clone.
+		"""
+		board = object.__new__(type(self))
+		board._current_player = current_player
+		board._chain_length_goal = self._chain_length_goal
+		board._longest_streak_to_win = self._longest_streak_to_win
+		board._geometry = self._geometry
+		board._last_move = None
+		board._winner = None
+		return board
+
+	def _compute_evaluation_state(self):
+		"""
+		Compute the evaluation state of this board from scratch.
+
+		The evaluation state is what the evaluation functions need to know
+		about the board, kept up to date by do_move:
+
+		* _line_counts: for each player, the number of their tokens in each
+		  line of the board's geometry
+		* _chain_groups: for each player, a list of the number of lines that
+		  hold each number of their tokens and none of their opponent's
+		* _chain_group_scores: for each player, the sum of 2**k over those
+		  lines, where k is the number of their tokens in the line
+		* _center_distances: for each player, the sum of the distances of
+		  their tokens from the center column
+		* _longest_chains: for each player, the length of their longest chain
+		* _num_tokens: the number of tokens on the board
+
+		The state of each player is indexed by their ID.
+		"""
+		player1_counts, player2_counts = self._count_line_tokens()
+		self._line_counts = (None, player1_counts, player2_counts)
+		groups = [None, [0] * (self._chain_length_goal + 1),
+			[0] * (self._chain_length_goal + 1)]
+		scores = [0, 0, 0]
+		for player1_count, player2_count in zip(player1_counts, player2_counts):
+			if player1_count and not player2_count:
+				groups[1][player1_count] += 1
+				scores[1] += 1 << player1_count
+			elif player2_count and not player1_count:
+				groups[2][player2_count] += 1
+				scores[2] += 1 << player2_count
+		self._chain_groups = tuple(groups)
+		self._chain_group_scores = tuple(scores)
+		center = self._geometry.center
+		distances = [0, 0, 0]
+		num_tokens = 0
+		for (row, col), player_id in zip(self._geometry.cells, self._get_cells()):
+			if player_id:
+				distances[player_id] += abs(center - col)
+				num_tokens += 1
+		self._center_distances = tuple(distances)
+		self._longest_chains = (0, self._find_longest_chain(1),
+			self._find_longest_chain(2))
+		self._num_tokens = num_tokens
+
+	def _get_cells(self):
+		"""
+		Return a tuple of the ID of the player owning each cell, or 0 for
+		empty cells, indexed like the cells of the board's geometry.
+		"""
+		return sum(self._board_array, ())
+
+	def _count_line_tokens(self):
+		"""
+		Return two lists, of the number of tokens player 1 and player 2
+		have in each win line of the board's geometry.
+		"""
+		cells = self._get_cells()
+		player1_counts = []
+		player2_counts = []
+		for line in self._geometry.flat_win_lines:
+			owners = [cells[i] for i in line]
+			player1_counts.append(owners.count(1))
+			player2_counts.append(owners.count(2))
+		return player1_counts, player2_counts
+
+	def _update_evaluation_state(self, parent, row, col, player_id):
+		"""
+		Set the evaluation state of this board to that of its parent board,
+		updated for the token that player_id placed in the specified cell.
+		Only the lines through that cell are looked at.
+		"""
+		other_id = 2 if player_id == 1 else 1
+		my_counts = list(parent._line_counts[player_id])
+		other_counts = parent._line_counts[other_id]
+		my_groups = list(parent._chain_groups[player_id])
+		other_groups = parent._chain_groups[other_id]
+		my_score = parent._chain_group_scores[player_id]
+		other_score = parent._chain_group_scores[other_id]
+		geometry = self._geometry
+		for line in geometry.lines_through_cells[row * geometry.board_width + col]:
+			count = my_counts[line]
+			my_counts[line] = count + 1
+			other_count = other_counts[line]
+			if not other_count:
+				# The line was open for this player and has one more token
+				if count:
+					my_groups[count] -= 1
+					my_score -= 1 << count
+				my_groups[count + 1] += 1
+				my_score += 1 << (count + 1)
+			elif not count:
+				# The line was open for the opponent and is now blocked
+				if other_groups is parent._chain_groups[other_id]:
+					other_groups = list(other_groups)
+				other_groups[other_count] -= 1
+				other_score -= 1 << other_count
+		distances = list(parent._center_distances)
+		distances[player_id] += abs(geometry.center - col)
+		# Tokens are never removed, so only the player's chains can grow,
+		# and only through the new token
+		longest_chains = parent._longest_chains
+		length = self._chain_length_through(row, col, player_id)
+		if length > longest_chains[player_id]:
+			longest_chains = list(longest_chains)
+			longest_chains[player_id] = length
+			longest_chains = tuple(longest_chains)
+		self._longest_chains = longest_chains
+		if player_id == 1:
+			self._line_counts = (None, my_counts, other_counts)
+			self._chain_groups = (None, my_groups, other_groups)
+			self._chain_group_scores = (0, my_score, other_score)
+		else:
+			self._line_counts = (None, other_counts, my_counts)
+			self._chain_groups = (None, other_groups, my_groups)
+			self._chain_group_scores = (0, other_score, my_score)
+		self._center_distances = tuple(distances)
+		self._num_tokens = parent._num_tokens + 1
+
+	def _copy_evaluation_state(self, other):
+		"""Set the evaluation state of this board to that of an identical one."""
+		self._line_counts = other._line_counts
+		self._chain_groups = other._chain_groups
+		self._chain_group_scores = other._chain_group_scores
+		self._center_distances = other._center_distances
+		self._longest_chains = other._longest_chains
+		self._num_tokens = other._num_tokens
 
 	def __str__(self):
 		"""Return a printable string representation of this board."""
 		return '\n%s\n%s\n' % (
-			'\n'.join(str(i) + ' ' + ' '.join(self.board_symbols[t] for t in row)
-				for i, row in enumerate(self._board_array)),
-			'  ' + ' '.join(str(col) for col in xrange(self.board_width)))
+			'\n'.join(str(row) + ' ' + ' '.join(self.board_symbols[self.get_cell(row, col)]
+				for col in range(self.board_width)) for row in range(self.board_height)),
+			'  ' + ' '.join(str(col) for col in range(self.board_width)))
 
 	def __repr__(self):
 		"""Return a string representation of this board."""
 		return str(self)
 
+	def __getstate__(self):
+		"""Return the attributes of this board as a dictionary, for pickling."""
+		return dict((name, getattr(self, name))
+			for cls in type(self).__mro__ for name in getattr(cls, '__slots__', ())
+			if hasattr(self, name))
+
+	def __setstate__(self, state):
+		"""Set the attributes of this board from a pickled dictionary."""
+		for name, value in state.items():
+			setattr(self, name, value)
+
 	def __hash__(self):
 		"""
 		Return the hash key of a board.
@@ -84,6 +424,59 @@ class ConnectFourBoard(object):
 		"""Return whether this board is equal to another one."""
 		return self._board_array == other._board_array
 
+	def position_key(self):
+		"""
+		Return an integer that identifies the tokens on this board, and is the
+		same in every process and Python version, unlike the hash key.
+
+		Each column takes board_height + 1 bits, starting from the lowest bit
+		for column 0. Within a column, the bits from the lowest one up are 1
+		for each of player 1's tokens and 0 for each of player 2's tokens, from
+		the bottom row up, followed by a 1 just above the topmost token.
+		"""
+		key = 0
+		for column in reversed(list(zip(*self._board_array))):
+			column_key = 1
+			for player_id in column:
+				if player_id:
+					column_key = (column_key << 1) | (player_id == 1)
+			key = (key << (self.board_height + 1)) | column_key
+		return key
+
+	def canonical_key(self):
+		"""
+		Return the smaller of the position keys of this board and its mirror
+		image, so that a position and its mirror image have the same key.
+		"""
+		return self.canonical_key_and_mirrored()[0]
+
+	def canonical_key_and_mirrored(self):
+		"""
+		Return the canonical key of this board (see canonical_key), and
+		whether it is the key of the mirror image rather than of this board,
+		in which case moves stored under the key have to be mirrored.
+		"""
+		key = self.position_key()
+		mirrored = mirror_position_key(key, self.board_width, self.board_height)
+		if mirrored < key:
+			return mirrored, True
+		return key, False
+
+	def is_symmetric(self):
+		"""Return whether this board is the same as its mirror image."""
+		return all(row == row[::-1] for row in self._board_array)
+
+	def mirror(self):
+		"""Return the mirror image of this board, with the columns reversed."""
+		board = type(self)([[self.get_cell(row, col)
+			for col in reversed(range(self.board_width))]
+			for row in range(self.board_height)], self._current_player,
+			self._chain_length_goal, self._longest_streak_to_win)
+		if self._last_move is not None:
+			row, col = self._last_move
+			board._last_move = (row, self.board_width - 1 - col)
+		return board
+
 	def get_current_player_id(self):
 		"""Return the ID of the player who should be moving now."""
 		return self._current_player
@@ -92,17 +485,20 @@ class ConnectFourBoard(object):
 		"""Return the ID of the opponent of the player who should be moving now."""
 		return 2 if self._current_player == 1 else 1
 
+	def get_chain_length_goal(self):
+		"""Return the length of the chain a player needs to win."""
+		return self._chain_length_goal
+
+	def get_geometry(self):
+		"""Return the BoardGeometry of this board's size and goal."""
+		return self._geometry
+
 	def num_tokens_on_board(self):
 		"""
 		Returns the total number of tokens (for either player) currently
 		on the board.
 		"""
-		tokens = 0
-		for row in self._board_array:
-			for col in row:
-				if col:
-					tokens += 1
-		return tokens
+		return self._num_tokens
 
 	def get_top_elt_in_column(self, column):
 		"""
@@ -120,8 +516,8 @@ class ConnectFourBoard(object):
 		Return the index of the lowest empty cell in the specified column.
 		Return -1 if the column is full.
 		"""
-		for row in xrange(self.board_height):
-			if self._board_array[row][column]:
+		for row, cells in enumerate(self._board_array):
+			if cells[column]:
 				return row - 1
 		return self.board_height - 1
 
@@ -145,14 +541,26 @@ class ConnectFourBoard(object):
 		old_board = self._board_array
 		old_row = old_board[row]
 		new_row = old_row[:column] + (self._current_player,) + old_row[column+1:]
-		new_board = old_board[:row] + (new_row,) + old_board[row+1:]
-		return ConnectFourBoard(new_board, self.get_opposite_player_id(),
-			self._chain_length_goal, self._longest_streak_to_win)
+		board = self._new_board(self.get_opposite_player_id())
+		board._board_array = old_board[:row] + (new_row,) + old_board[row+1:]
+		board._last_move = (row, column)
+		board._update_evaluation_state(self, row, column, self._current_player)
+		if not self._longest_streak_to_win:
+			# Only the new token can have completed a chain, and if it did,
+			# it made the player's longest chain
+			board._winner = self.is_win() or (self._current_player
+				if board._longest_chains[self._current_player] >=
+				self._chain_length_goal else 0)
+		return board
 
 	def clone(self):
 		"""Return a copy of the game board."""
-		return ConnectFourBoard(self._board_array, self._current_player,
-			self._chain_length_goal, self._longest_streak_to_win)
+		board = self._new_board(self._current_player)
+		board._board_array = self._board_array
+		board._last_move = self._last_move
+		board._winner = self._winner
+		board._copy_evaluation_state(self)
+		return board
 
 	def is_game_over(self):
 		""" Return True if the game has been won, False otherwise """
@@ -163,21 +571,41 @@ class ConnectFourBoard(object):
 		Return the ID of the player who has won this game.
 		Return 0 if it has not yet been won.
 		"""
+		if self._winner is None:
+			self._winner = self._find_winner()
+		return self._winner
+
+	def _find_winner(self):
+		"""
+		Return the ID of the player who has won this game, from the longest
+		chain of each player, which do_move keeps up to date. The board is
+		only scanned if both players have a winning chain.
+		Return 0 if it has not yet been won.
+		"""
 		if self._longest_streak_to_win:
-			if self.num_tokens_on_board() < 20:
+			if self._num_tokens < 20:
 				return False
-			current_streak = self.longest_chain(self.get_current_player_id())
-			opponent_streak = self.longest_chain(self.get_opposite_player_id())
+			current_streak = self._longest_chains[self._current_player]
+			opponent_streak = self._longest_chains[self.get_opposite_player_id()]
 			if current_streak > opponent_streak:
 				return self.get_current_player_id()
 			if opponent_streak > current_streak:
 				return self.get_opposite_player_id()
 			return 0
-		for row in xrange(self.board_height):
-			for col in xrange(self.board_width):
-				cell_player = self.get_cell(row, col)
-				if cell_player and self._is_win_from_cell(row, col):
-					return cell_player
+		goal = self._chain_length_goal
+		player1_won = self._longest_chains[1] >= goal
+		player2_won = self._longest_chains[2] >= goal
+		if player1_won and player2_won:
+			# Both players can only have chains if moves were made after
+			# the game was over; the first winning cell in reading order wins
+			for (row, col), player_id in zip(self._geometry.cells,
+				self._get_cells()):
+				if player_id and self._is_win_from_cell(row, col):
+					return player_id
+		if player1_won:
+			return 1
+		if player2_won:
+			return 2
 		return 0
 
 	def _is_win_from_cell(self, row, col):
@@ -185,7 +613,16 @@ class ConnectFourBoard(object):
 		Return whether there is a winning set of four connected nodes
 		containing the specified cell.
 		"""
-		return self._max_length_from_cell(row, col) >= self._chain_length_goal
+		player_id = self.get_cell(row, col)
+		if not player_id:
+			return False
+		counts = self._line_counts[player_id]
+		goal = self._chain_length_goal
+		geometry = self._geometry
+		for line in geometry.lines_through_cells[row * geometry.board_width + col]:
+			if counts[line] == goal:
+				return True
+		return False
 
 	def is_tie(self):
 		"""
@@ -197,67 +634,81 @@ class ConnectFourBoard(object):
 		return 0 not in self._board_array[0]
 
 	def chain_groups(self, player_id):
-		result = {x: 0 for x in xrange(1, self._chain_length_goal + 1)}
-		for row in range(self.board_height):
-			for col in range(self.board_width):
-				for dir in [(1, 0), (0, 1), (1, 1), (1, -1)]:
-					count = self._get_counts(row, col, dir, player_id)
-					if count:
-						result[count] += 1
-		return result
-
-	def _get_counts(self, row, col, dir, player_id):
-		if not (row + dir[0] * (self._chain_length_goal - 1) in xrange(self.board_height) and
-				col + dir[1] * (self._chain_length_goal - 1) in xrange(self.board_width)):
-			return 0
-		count = 0
-		for k in range(self._chain_length_goal):
-			code = self._board_array[row+dir[0]*k][col+dir[1]*k]
-			if code == player_id:
-				count += 1
-			elif code == 0:
-				pass
-			else:
-				return 0
-		return count
+		"""
+		Return a dictionary mapping each chain length from 1 to
+		chain_length_goal to the number of lines of chain_length_goal cells
+		that hold that many of the player's tokens and none of the opponent's.
+		"""
+		return self.chain_groups_by_player()[player_id]
+
+	def chain_groups_by_player(self):
+		"""
+		Return the chain_groups of both players, as a dictionary mapping
+		player IDs to their chain groups.
+		"""
+		return {player_id: {x: self._chain_groups[player_id][x]
+			for x in range(1, self._chain_length_goal + 1)}
+			for player_id in (1, 2)}
+
+	def chain_group_score(self, player_id):
+		"""
+		Return the sum of 2**k over the player's chain groups, where k is
+		the number of the player's tokens in the group.
+		"""
+		return self._chain_group_scores[player_id]
+
+	def center_distance(self, player_id):
+		"""
+		Return the sum of the distances of the player's tokens from the
+		center column.
+		"""
+		return self._center_distances[player_id]
 
 	def longest_chain(self, player_id):
 		"""
 		Returns the length of the longest chain of tokens controlled by this player,
 		0 if the player has no tokens on the board
 		"""
+		return self._longest_chains[player_id]
+
+	def _find_longest_chain(self, player_id):
+		"""
+		Return the length of the longest chain of the player's tokens by
+		scanning the whole board.
+		"""
+		cells = self._get_cells()
 		longest = 0
-		for row in xrange(self.board_height):
-			for col in xrange(self.board_width):
-				if self.get_cell(row, col) == player_id:
-					longest = max(longest, self._max_length_from_cell(row, col))
+		for line in self._geometry.board_lines:
+			length = 0
+			for cell in line:
+				if cells[cell] == player_id:
+					length += 1
+					if length > longest:
+						longest = length
+				else:
+					length = 0
 		return longest
 
-	def _max_length_from_cell(self, row, col):
-		"""Return the max-length chain containing this cell."""
-		return 1 + max(
-			self._contig_vector_length(row, col, (1, 0)) +
-				self._contig_vector_length(row, col, (-1, 0)),
-			self._contig_vector_length(row, col, (0, 1)) +
-				self._contig_vector_length(row, col, (0, -1)),
-			self._contig_vector_length(row, col, (1, 1)) +
-				self._contig_vector_length(row, col, (-1, -1)),
-			self._contig_vector_length(row, col, (1, -1)) +
-				self._contig_vector_length(row, col, (-1, 1)))
-
-	def _contig_vector_length(self, row, col, dir):
+	def _chain_length_through(self, row, col, player_id):
 		"""
-		Starting in the specified cell and going a step of dir = (row_step, col_step),
-		count how many consecutive cells are owned by the same player as the starting cell.
+		Return the length of the longest chain of the player's tokens through
+		the specified cell, which holds one of them.
 		"""
-		count = 0
-		player_id = self.get_cell(row, col)
-		while (0 <= row < self.board_height and 0 <= col < self.board_width and
-			player_id == self.get_cell(row, col)):
-			row += dir[0]
-			col += dir[1]
-			count += 1
-		return count - 1
+		board_array = self._board_array
+		longest = 0
+		for forward, backward in self._geometry.rays[row * self.board_width + col]:
+			length = 1
+			for cell_row, cell_col in forward:
+				if board_array[cell_row][cell_col] != player_id:
+					break
+				length += 1
+			for cell_row, cell_col in backward:
+				if board_array[cell_row][cell_col] != player_id:
+					break
+				length += 1
+			if length > longest:
+				longest = length
+		return longest
 
 	def chain_cells(self, player_id):
 		"""
@@ -280,100 +731,283 @@ class ConnectFourBoard(object):
 		to remove such elements via a list comprehension or the built-in
 		filter function.
 		"""
-		cells = set()
-		for row in xrange(self.board_height):
-			for col in xrange(self.board_width):
-				if self.get_cell(row, col) == player_id:
-					cells.update(self._chain_sets_from_cell(row, col))
-		return cells
-
-	def _chain_sets_from_cell(self, row, col):
-		""" Return the max-length chain containing this cell """
-		return [tuple(x) for x in [
-			list(reversed(self._contig_vector_cells(row, col, (1, 0)))) +
-				[(row, col)] + self._contig_vector_cells(row, col, (-1, 0)),
-			list(reversed(self._contig_vector_cells(row, col, (0, 1)))) +
-				[(row, col)] + self._contig_vector_cells(row, col, (0, -1)),
-			list(reversed(self._contig_vector_cells(row, col, (1, 1)))) +
-				[(row, col)] + self._contig_vector_cells(row, col, (-1, -1)),
-			list(reversed(self._contig_vector_cells(row, col, (1, -1)))) +
-				[(row, col)] + self._contig_vector_cells(row, col, (-1, 1))]]
-
-	def _contig_vector_cells(self, row, col, dir):
-		"""
-		Return how many consecutive cells are owned by the same player
-		as the specified starting cell, stepping by dir = (row_step, col_step).
+		cells = self._get_cells()
+		chains = set()
+		for index, owner in enumerate(cells):
+			if owner == player_id:
+				chains.update(self._chain_sets_from_cell(cells, index))
+		return chains
+
+	def _chain_sets_from_cell(self, cells, index):
 		"""
-		cells = []
-		player_id = self.get_cell(row, col)
-		while (0 <= row < self.board_height and 0 <= col < self.board_width and
-			player_id == self.get_cell(row, col)):
-			row += dir[0]
-			col += dir[1]
-			cells.append((row, col))
-		return cells[:-1]
+		Return the chains along each direction through the cell at index,
+		given the owners of the cells from _get_cells.
+		"""
+		geometry = self._geometry
+		chains = []
+		for forward, backward in geometry.rays[index]:
+			ahead = self._contig_ray_cells(cells, cells[index], forward)
+			behind = self._contig_ray_cells(cells, cells[index], backward)
+			chains.append(tuple(reversed(ahead)) + (geometry.cells[index],) +
+				tuple(behind))
+		return chains
+
+	def _contig_ray_cells(self, cells, player_id, ray):
+		"""
+		Return the coordinates of the cells along ray that are owned by
+		player_id, up to the first cell that is not, given the owners of
+		the cells from _get_cells.
+		"""
+		contig = []
+		for row, col in ray:
+			if cells[row * self.board_width + col] != player_id:
+				break
+			contig.append((row, col))
+		return contig
 
 
-class ConnectFourRunner(object):
+class BitboardConnectFourBoard(ConnectFourBoard):
 	"""
-	Runs a game of Connect Four.
-
-	The rules of this Connect Four game are as follows:
-
-	* The game is a two-player game. Players take turns adding tokens to
-	  the board.
-	* When a token is added to the board, it is added to a particular column.
-	  It "falls" to the unoccupied cell in the column with the largest index.
-	* The game ends when one of the two players has four consecutive tokens
-	  in a row (either horizontally, vertically, or on 45-degree diagonals),
-	  or when the board is completely filled. If the game ends with a player
-	  having four consecutive diagonal tokens, that player is the winner.
-
-	The game runner is implemented via callbacks: The two players specify
-	callbacks to be called when it's their turn. The callback is passed two
-	arguments, self and self.get_board(). The callback functions must return
-	integers corresponding to the columns they want to drop a token into.
+	Store a Connect Four board as a pair of integer bitmasks.
+
+	This board has the same interface and behavior as ConnectFourBoard, but
+	each player's tokens are stored as bits of an integer, laid out by column
+	with one extra sentinel bit on top of every column:
+
+		6 13 20 27 34 41 48   (sentinel row, always empty)
+		5 12 19 26 33 40 47   row 0
+		4 11 18 25 32 39 46   row 1
+		3 10 17 24 31 38 45   row 2
+		2  9 16 23 30 37 44   row 3
+		1  8 15 22 29 36 43   row 4
+		0  7 14 21 28 35 42   row 5
+
+	The sentinel bits keep chains from wrapping around between columns, so
+	chains can be found by shifting a bitmask by a fixed amount for each
+	direction and masking it with itself.
 	"""
 
-	def __init__(self, player1_callback, player2_callback, board=None):
-		"""Create a new ConnectFourRunner."""
-		self._board = board or ConnectFourBoard()
-		self.player1_callback = player1_callback
-		self.player2_callback = player2_callback
-
-	def get_board(self):
-		"""Return the current game board."""
-		return self._board
-
-	def run_game(self, verbose=True):
-		"""
-		Run the test defined by this test runner.
-		Print and return the ID of the winning player.
-		"""
-		player1 = (self.player1_callback, 1, self._board.board_symbols[1])
-		player2 = (self.player2_callback, 2, self._board.board_symbols[2])
-		while not self._board.is_game_over():
-			for callback, player_id, symbol in (player1, player2):
-				if verbose:
-					print self._board
-				while True:
-					try:
-						new_column = callback(self._board.clone())
-						print ('Player %s (%s) puts a token in column %s' %
-							(player_id, symbol, new_column))
-						self._board = self._board.do_move(new_column)
-						break
-					except InvalidMoveException as ex:
-						print ex
-						print 'Illegal move attempted. Please try again.'
-				if self._board.is_game_over():
-					break
-		winner = self._board.is_win()
-		if winner:
-			print 'Win for %s!' % self._board.board_symbols[winner]
-		else:
-			print "It's a tie! No winner is declared."
-		if verbose:
-			print self._board
-		# TODO: return numNodesExpanded for player 1 or 2?
+	__slots__ = ('_bits', '_heights')
+
+	def __init__(self, board_array=None, current_player=1,
+		chain_length_goal=4, longest_streak_to_win=False):
+		"""
+		Create a new BitboardConnectFourBoard.
+
+		The arguments are the same as those of ConnectFourBoard.
+		"""
+		self._geometry = get_board_geometry(self.board_width, self.board_height,
+			chain_length_goal)
+		bits = [0, 0, 0]
+		heights = [0] * self.board_width
+		if board_array:
+			for row, cells in enumerate(board_array):
+				for col, player_id in enumerate(cells):
+					if player_id:
+						bits[player_id] |= self._cell_bit(row, col)
+						heights[col] = max(heights[col], self.board_height - row)
+		self._bits = tuple(bits)
+		self._heights = tuple(heights)
+		self._current_player = current_player
+		self._chain_length_goal = chain_length_goal
+		self._longest_streak_to_win = longest_streak_to_win
+		self._last_move = None
+		self._winner = None
+		self._compute_evaluation_state()
+
+	def _cell_bit(self, row, col):
+		"""Return the bitmask of the specified cell."""
+		return self._geometry.cell_bits[row * self.board_width + col]
+
+	def _get_cells(self):
+		"""
+		Return a tuple of the ID of the player owning each cell, or 0 for
+		empty cells, indexed like the cells of the board's geometry.
+		"""
+		player1_bits, player2_bits = self._bits[1], self._bits[2]
+		return tuple(1 if player1_bits & bit else 2 if player2_bits & bit else 0
+			for bit in self._geometry.cell_bits)
+
+	def _count_line_tokens(self):
+		"""
+		Return two lists, of the number of tokens player 1 and player 2
+		have in each win line of the board's geometry.
+		"""
+		masks = self._geometry.win_line_masks
+		return ([bin(self._bits[1] & mask).count('1') for mask in masks],
+			[bin(self._bits[2] & mask).count('1') for mask in masks])
+
+	def __hash__(self):
+		"""
+		Return the hash key of a board.
+		The hash key must be the same on any two identical boards.
+		"""
+		return hash(self._bits)
+
+	def __eq__(self, other):
+		"""Return whether this board is equal to another one."""
+		return self._bits == other._bits
+
+	def position_key(self):
+		"""
+		Return an integer that identifies the tokens on this board, and is the
+		same in every process and Python version, unlike the hash key.
+		"""
+		# Adding the bottom bit of each column to its occupied bits carries
+		# into the bit just above the topmost token
+		return (self._bits[1] + (self._bits[1] | self._bits[2]) +
+			self._geometry.bottom_mask)
+
+	def is_symmetric(self):
+		"""Return whether this board is the same as its mirror image."""
+		if self._heights != self._heights[::-1]:
+			return False
+		key = self.position_key()
+		return key == mirror_position_key(key, self.board_width, self.board_height)
+
+	def get_top_elt_in_column(self, column):
+		"""
+		Return the ID of the player who put the topmost token in the
+		specified column.
+		Return 0 if the column is empty.
+		"""
+		height = self._heights[column]
+		if not height:
+			return 0
+		return self.get_cell(self.board_height - height, column)
+
+	def get_top_of_column(self, column):
+		"""
+		Return the index of the lowest empty cell in the specified column.
+		Return -1 if the column is full.
+		"""
+		return self.board_height - 1 - self._heights[column]
+
+	def get_cell(self, row, col):
+		"""
+		Return the ID of the player owning the token in the specified cell.
+		Return 0 if it is unclaimed.
+		"""
+		assert(0 <= row < self.board_height and 0 <= col < self.board_width)
+		bit = self._geometry.cell_bits[row * self.board_width + col]
+		if self._bits[1] & bit:
+			return 1
+		if self._bits[2] & bit:
+			return 2
 		return 0
+
+	def do_move(self, column):
+		"""
+		Execute the specified move as the specified player.
+		Return a new board with the result.
+		Raise InvalidMoveException if the specified move is invalid.
+		"""
+		if not 0 <= column < self.board_width:
+			raise InvalidMoveException(column, self)
+		height = self._heights[column]
+		if height >= self.board_height:
+			raise InvalidMoveException(column, self)
+		bit = 1 << (column * (self.board_height + 1) + height)
+		if self._current_player == 1:
+			bits = (0, self._bits[1] | bit, self._bits[2])
+		else:
+			bits = (0, self._bits[1], self._bits[2] | bit)
+		heights = (self._heights[:column] + (height + 1,) +
+			self._heights[column+1:])
+		row = self.board_height - 1 - height
+		board = self._new_board(self.get_opposite_player_id())
+		board._bits = bits
+		board._heights = heights
+		board._last_move = (row, column)
+		board._update_evaluation_state(self, row, column, self._current_player)
+		if not self._longest_streak_to_win:
+			# Only the moving player's tokens can have formed a new chain
+			board._winner = self.is_win() or (self._current_player
+				if board._longest_chains[self._current_player] >=
+				self._chain_length_goal else 0)
+		return board
+
+	def clone(self):
+		"""Return a copy of the game board."""
+		board = self._new_board(self._current_player)
+		board._bits = self._bits
+		board._heights = self._heights
+		board._last_move = self._last_move
+		board._winner = self._winner
+		board._copy_evaluation_state(self)
+		return board
+
+	def is_tie(self):
+		"""
+		Return whether the game has reached a stalemate, assuming that
+		self.is_win() returns False.
+		"""
+		if self._longest_streak_to_win:
+			return self.num_tokens_on_board() == 20
+		return min(self._heights) == self.board_height
+
+	def _chain_length_through(self, row, col, player_id):
+		"""
+		Return the length of the longest chain of the player's tokens through
+		the specified cell, which holds one of them.
+		"""
+		bits = self._bits[player_id]
+		bit = self._geometry.cell_bits[row * self.board_width + col]
+		longest = 0
+		for shift in self._geometry.shifts:
+			length = 1
+			# Steps off the board land on sentinel bits or below bit 0
+			neighbor = bit << shift
+			while bits & neighbor:
+				length += 1
+				neighbor <<= shift
+			neighbor = bit >> shift
+			while bits & neighbor:
+				length += 1
+				neighbor >>= shift
+			if length > longest:
+				longest = length
+		return longest
+
+	def _find_longest_chain(self, player_id):
+		"""
+		Return the length of the longest chain of the player's tokens by
+		checking their bitmask.
+		"""
+		bits = self._bits[player_id]
+		if not bits:
+			return 0
+		longest = 1
+		for shift in self._geometry.shifts:
+			chain = bits & (bits >> shift)
+			length = 1
+			while chain:
+				length += 1
+				chain &= chain >> shift
+			longest = max(longest, length)
+		return longest
+
+
+# The game runner lives in its own module, so that searching a board does not
+# import it; it is imported from there the first time it is used from here
+_RUNNER_NAMES = ('GameObserver', 'PrintingObserver', 'GameResult',
+	'ConnectFourRunner')
+
+def __getattr__(name):
+	"""
+	Import the game runner classes from the runner module when used, and
+	make the board classes of make_board_class when looked up by name, as
+	unpickling does.
+	"""
+	if name in _RUNNER_NAMES:
+		import runner
+		return getattr(runner, name)
+	# The classes of make_board_class are named like ConnectFourBoard8x7
+	prefix, x, height = name.rpartition('x')
+	base_name = prefix.rstrip('0123456789')
+	width = prefix[len(base_name):]
+	base = globals().get(base_name)
+	if (width.isdigit() and height.isdigit() and isinstance(base, type) and
+		issubclass(base, ConnectFourBoard)):
+		return make_board_class(int(width), int(height), base)
+	raise AttributeError('module %r has no attribute %r' % (__name__, name))
@@ -0,0 +1,123 @@
+import sys
+
+
+class EvalCache(object):
+	"""
+	Cache the scores of an evaluation function.
+
+	An EvalCache is called like the 'eval_fn' it wraps, and can be passed as
+	the eval_fn of minimax, alpha_beta_search and the other searches. Since
+	evaluation functions only depend on the board, the scores stay valid
+	from one search to the next, and one cache can be kept for a whole game
+	or longer; clear it to free its memory.
+
+	Boards are identified by their position key and the side to move. If
+	symmetric is True, their canonical key is used instead, so a board and its
+	mirror image share a score; the evaluation function must then give them
+	the same score, as basic_evaluate and new_evaluate do.
+
+	At most max_size scores are kept, and max_size must be at least 1. When
+	the cache is full, a score is evicted with the CLOCK algorithm, an
+	approximation of least recently used eviction: the slots are visited in
+	a circle, and the first slot whose score has not been used since the
+	last visit is replaced.
+
+	Lookups update three counters: hits, misses and evictions.
+
+	Computing a position key takes a few microseconds, so caching only pays
+	off for evaluation functions slower than that. basic_evaluate and
+	new_evaluate read scores that the boards keep up to date, and are faster
+	without a cache.
+	"""
+
+	def __init__(self, eval_fn, max_size=2**16, symmetric=False):
+		"""Create a new, empty EvalCache for eval_fn."""
+		if max_size < 1:
+			raise ValueError('An EvalCache needs room for at least 1 score, not %d' %
+				max_size)
+		self.eval_fn = eval_fn
+		self.max_size = max_size
+		self.symmetric = symmetric
+		self.__name__ = getattr(eval_fn, '__name__', 'eval_fn')
+		self.clear()
+
+	def clear(self):
+		"""Remove every score and reset the counters."""
+		# Map of keys to slots, and the key, score and used flag in each slot
+		self._slots = {}
+		self._keys = []
+		self._scores = []
+		self._used = []
+		self._hand = 0
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+
+	def __len__(self):
+		"""Return the number of scores in this cache."""
+		return len(self._keys)
+
+	def key(self, board):
+		"""Return the key of a board, including the side to move."""
+		if self.symmetric:
+			key = board.canonical_key()
+		else:
+			key = board.position_key()
+		return key << 1 | (board.get_current_player_id() == 2)
+
+	def __call__(self, board):
+		"""Return the score of the specified board, evaluating it if needed."""
+		key = self.key(board)
+		slot = self._slots.get(key)
+		if slot is not None:
+			self.hits += 1
+			self._used[slot] = True
+			return self._scores[slot]
+		self.misses += 1
+		score = self.eval_fn(board)
+		if len(self._keys) < self.max_size:
+			self._slots[key] = len(self._keys)
+			self._keys.append(key)
+			self._scores.append(score)
+			self._used.append(False)
+			return score
+		# Clear the used flags up to the first slot without one
+		while self._used[self._hand]:
+			self._used[self._hand] = False
+			self._hand = (self._hand + 1) % self.max_size
+		slot = self._hand
+		del self._slots[self._keys[slot]]
+		self._slots[key] = slot
+		self._keys[slot] = key
+		self._scores[slot] = score
+		self._hand = (slot + 1) % self.max_size
+		self.evictions += 1
+		return score
+
+	def get_hit_rate(self):
+		"""Return the fraction of lookups that found a score in the cache."""
+		lookups = self.hits + self.misses
+		if not lookups:
+			return 0.0
+		return float(self.hits) / lookups
+
+	def get_memory_use(self):
+		"""
+		Return an estimate of the number of bytes used by the cache, counting
+		the containers, keys and scores but not shared objects such as small
+		integers.
+		"""
+		return (sys.getsizeof(self._slots) + sys.getsizeof(self._keys) +
+			sys.getsizeof(self._scores) + sys.getsizeof(self._used) +
+			sum(sys.getsizeof(key) for key in self._keys) +
+			sum(sys.getsizeof(score) for score in self._scores))
+
+	def __str__(self):
+		"""Return a printable string representation of this cache."""
+		return 'EvalCache(%s, %d/%d scores, %.1f%% hits, %d bytes)' % (
+			self.__name__, len(self), self.max_size, self.get_hit_rate() * 100,
+			self.get_memory_use())
+
+	def __repr__(self):
+		"""Return a string representation of this cache."""
+		return str(self)
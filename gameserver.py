@@ -0,0 +1,554 @@
+"""
+An asyncio host for many concurrent Connect Four games.
+
+An AsyncGameHost plays games between async player callbacks, each move with
+a time limit. Many games run at once on one event loop; the CPU-heavy
+searches of the bots run in a pool of worker processes, so a slow search
+never holds up the other games:
+
+	host = gameserver.AsyncGameHost()
+	bot = host.run_in_executor(basicplayer.alpha_beta_player)
+	results = await asyncio.gather(*[host.play_game(bot, other_bot)
+		for i in range(100)])
+
+A GameServer lets clients play against the bots over a line-based protocol
+on a local TCP socket, one game after another on each connection. Each line
+is a command and its arguments, separated by spaces. The client sends:
+
+	PLAY <bot> [1|2]   start a game against a bot, as player 1 (the default)
+	                   or 2
+	<column>           a move, when asked for one
+	STATS              ask for the server's statistics
+	QUIT               close the connection
+
+and the server answers:
+
+	START <player>     a game started, with the client as this player
+	TURN               the client should send a move
+	MOVE <player> <column>
+	                   a player made a move, including the client
+	INVALID <column>   the client's move was illegal; another TURN follows
+	END <winner> [forfeit]
+	                   the game is over; the winner is 0 for a tie, and
+	                   forfeit means the loser ran out of time
+	STATS <name>=<value> ...
+	ERROR <message>    a command was not understood
+
+Run a server, or a load test that plays many games against a server in the
+same process and reports the throughput and move latencies:
+
+	python gameserver.py serve --port 8765
+	python gameserver.py loadtest --clients 200 --games 2 --bot random
+"""
+
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import math
+import random
+import sys
+import time
+import connectfour
+import basicplayer
+import runner
+import tournament
+
+# The bots that clients can play against, by name
+DEFAULT_BOTS = {
+	'random': basicplayer.random_player,
+	'basic': basicplayer.basic_player,
+	'new': basicplayer.new_player,
+	'alpha_beta': basicplayer.alpha_beta_player,
+}
+
+
+def percentile(values, fraction):
+	"""
+	Return the value below which the specified fraction of values lie,
+	by the nearest-rank method, or 0.0 if there are no values.
+	"""
+	if not values:
+		return 0.0
+	values = sorted(values)
+	index = int(math.ceil(fraction * len(values))) - 1
+	return values[min(max(index, 0), len(values) - 1)]
+
+
+def make_process_executor(max_workers=None):
+	"""
+	Return a pool of worker processes for the searches of an AsyncGameHost,
+	forked where possible so that the workers start quickly.
+	"""
+	return concurrent.futures.ProcessPoolExecutor(max_workers,
+		mp_context=tournament.get_pool_context())
+
+
+class MoveTimeout(Exception):
+	"""Exception raised when a player takes longer than the time limit."""
+
+	def __init__(self, player_id, time_limit):
+		"""Initialize this MoveTimeout."""
+		self.player_id = player_id
+		self.time_limit = time_limit
+
+	def __str__(self):
+		"""Return a printable string representation of this exception."""
+		return 'MoveTimeout: Player %d took more than %gs to move' % (
+			self.player_id, self.time_limit)
+
+	def __repr__(self):
+		"""Return a string representation of this exception."""
+		return str(self)
+
+
+class AsyncGameHost(object):
+	"""
+	Play Connect Four games between async player callbacks on an asyncio
+	event loop.
+
+	A player callback is a coroutine function that takes the current board
+	and returns a column, or a (column, stats) pair like the callbacks of
+	ConnectFourRunner. Wrap ordinary callbacks with run_in_executor. If a
+	callback has a new_game attribute, it is called at the start of each game.
+
+	Each move must be made within move_timeout seconds, illegal moves
+	included; a player who runs out of time forfeits the game. The host
+	counts the moves over every game it has played, for get_moves_per_second,
+	and keeps the seconds each player took for the last max_latencies moves,
+	for get_latency.
+	"""
+
+	def __init__(self, executor=None, move_timeout=30.0, max_latencies=10000):
+		"""
+		Create a new AsyncGameHost. Callbacks wrapped with run_in_executor
+		run in executor, a concurrent.futures executor; by default, a pool of
+		worker processes is created when first needed. If max_latencies is
+		None, the latency of every move is kept, which a server that runs
+		for long should not do.
+		"""
+		self.move_timeout = move_timeout
+		self.max_latencies = max_latencies
+		self._executor = executor
+		self._owns_executor = executor is None
+		self.reset_stats()
+
+	def reset_stats(self):
+		"""Reset the counts of games and moves and the move latencies."""
+		self.games_started = 0
+		self.games_finished = 0
+		self.moves = 0
+		self.forfeits = 0
+		self.move_latencies = collections.deque(maxlen=self.max_latencies)
+		self._start = time.perf_counter()
+
+	def get_executor(self):
+		"""Return the executor of run_in_executor, creating it if needed."""
+		if self._executor is None:
+			self._executor = make_process_executor()
+		return self._executor
+
+	def close(self):
+		"""Shut down the executor if this host created it."""
+		if self._owns_executor and self._executor is not None:
+			self._executor.shutdown()
+			self._executor = None
+
+	def run_in_executor(self, callback):
+		"""
+		Return an async player callback that calls the ordinary player
+		callback in this host's executor, which must be able to pickle it
+		if it is a pool of processes (closures can only run in threads).
+		"""
+		async def player(board):
+			loop = asyncio.get_running_loop()
+			return await loop.run_in_executor(self.get_executor(), callback, board)
+		player.__name__ = getattr(callback, '__name__', 'player')
+		new_game = getattr(callback, 'new_game', None)
+		if new_game is not None:
+			player.new_game = new_game
+		return player
+
+	async def play_game(self, player1_callback, player2_callback, board=None,
+		board_class=connectfour.ConnectFourBoard, observers=()):
+		"""
+		Play a game, starting from board or an empty board of board_class,
+		and send its events to the GameObserver objects in observers.
+		Return the GameResult of the game.
+		"""
+		board = board or board_class()
+		callbacks = {1: player1_callback, 2: player2_callback}
+		for callback in (player1_callback, player2_callback):
+			new_game = getattr(callback, 'new_game', None)
+			if new_game is not None:
+				new_game()
+		result = runner.GameResult(board)
+		self.games_started += 1
+		for observer in observers:
+			observer.on_game_start(board)
+		try:
+			while not board.is_game_over():
+				player_id = board.get_current_player_id()
+				start = time.perf_counter()
+				column = await self._get_move(callbacks[player_id], board, player_id,
+					result, observers)
+				elapsed = time.perf_counter() - start
+				board = board.do_move(column)
+				result.moves.append(column)
+				result.move_times.append(elapsed)
+				result.board = board
+				self.moves += 1
+				self.move_latencies.append(elapsed)
+				for observer in observers:
+					observer.on_move(player_id, column, board, elapsed)
+			result.winner = board.is_win()
+		except MoveTimeout as ex:
+			result.winner = 2 if ex.player_id == 1 else 1
+			result.forfeit = ex.player_id
+			self.forfeits += 1
+		self.games_finished += 1
+		for observer in observers:
+			observer.on_game_over(result)
+		return result
+
+	async def _get_move(self, callback, board, player_id, result, observers):
+		"""
+		Ask a player for moves until one is legal, and return it.
+		Raise MoveTimeout if the player runs out of time first.
+		"""
+		loop = asyncio.get_running_loop()
+		deadline = loop.time() + self.move_timeout
+		while True:
+			try:
+				column = await asyncio.wait_for(callback(board),
+					max(deadline - loop.time(), 0))
+			except asyncio.TimeoutError:
+				# A search in the executor cannot be stopped, and finishes
+				# in the background
+				raise MoveTimeout(player_id, self.move_timeout)
+			if isinstance(column, tuple):
+				column, stats = column
+				result.stats[player_id].merge(stats)
+			if (isinstance(column, int) and 0 <= column < board.board_width and
+				board.get_top_of_column(column) >= 0):
+				return column
+			ex = connectfour.InvalidMoveException(column, board)
+			for observer in observers:
+				observer.on_invalid_move(player_id, ex)
+
+	def get_moves_per_second(self):
+		"""Return the number of moves made per second since the stats were reset."""
+		elapsed = time.perf_counter() - self._start
+		if elapsed <= 0:
+			return 0.0
+		return self.moves / elapsed
+
+	def get_latency(self, fraction):
+		"""
+		Return the number of seconds within which the specified fraction of
+		the last max_latencies moves were made, such as 0.99 for the 99th
+		percentile.
+		"""
+		return percentile(self.move_latencies, fraction)
+
+	def format_stats(self):
+		"""Return the stats of this host as space-separated name=value pairs."""
+		return ('games=%d finished=%d moves=%d forfeits=%d moves_per_sec=%.1f '
+			'p50_ms=%.2f p99_ms=%.2f' % (self.games_started, self.games_finished,
+			self.moves, self.forfeits, self.get_moves_per_second(),
+			self.get_latency(0.5) * 1000, self.get_latency(0.99) * 1000))
+
+
+##############################################
+# Server
+##############################################
+
+
+class _RemotePlayer(object):
+	"""An async player callback that asks a connected client for its moves."""
+
+	def __init__(self, reader, writer):
+		"""Create a player for the client on the specified streams."""
+		self._reader = reader
+		self._writer = writer
+
+	async def __call__(self, board):
+		"""
+		Ask the client for a move and return it, as a string if it is not
+		a number.
+		"""
+		self._writer.write(b'TURN\n')
+		await self._writer.drain()
+		line = await self._reader.readline()
+		if not line:
+			raise ConnectionError('The client closed the connection')
+		try:
+			return int(line)
+		except ValueError:
+			return line.decode('ascii', 'replace').strip()
+
+
+class _ConnectionObserver(runner.GameObserver):
+	"""A GameObserver that sends the events of a game to a client."""
+
+	def __init__(self, writer, player_id):
+		"""Create an observer for the client on writer, playing player_id."""
+		self._writer = writer
+		self._player_id = player_id
+
+	def on_game_start(self, board):
+		"""Tell the client which player it is."""
+		self._writer.write(b'START %d\n' % self._player_id)
+
+	def on_move(self, player_id, column, board, elapsed):
+		"""Send the move to the client."""
+		self._writer.write(b'MOVE %d %d\n' % (player_id, column))
+
+	def on_invalid_move(self, player_id, exception):
+		"""Tell the client that its move was illegal."""
+		self._writer.write(b'INVALID %s\n' % str(exception._column).encode())
+
+	def on_game_over(self, result):
+		"""Send the winner to the client."""
+		self._writer.write(b'END %d%s\n' % (result.winner,
+			b' forfeit' if result.forfeit else b''))
+
+
+class GameServer(object):
+	"""
+	Serve games against bots to clients on a local TCP socket, with the
+	protocol described in the documentation of this module.
+	"""
+
+	def __init__(self, host, bots=None, board_class=connectfour.ConnectFourBoard):
+		"""
+		Create a GameServer that plays its games on an AsyncGameHost, against
+		the ordinary player callbacks in bots, a dictionary mapping bot names
+		to callbacks (DEFAULT_BOTS by default).
+		"""
+		self.host = host
+		self.board_class = board_class
+		self.bots = dict((name, host.run_in_executor(callback))
+			for name, callback in (bots or DEFAULT_BOTS).items())
+		self.connections = 0
+
+	async def start(self, address='127.0.0.1', port=0):
+		"""
+		Start listening, on any free port if port is 0.
+		Return the asyncio server, whose sockets give the port.
+		"""
+		return await asyncio.start_server(self._serve_client, address, port)
+
+	async def _serve_client(self, reader, writer):
+		"""Run the commands of one client until it disconnects."""
+		self.connections += 1
+		try:
+			while True:
+				line = await reader.readline()
+				if not line:
+					break
+				command = line.decode('ascii', 'replace').split()
+				if not command:
+					continue
+				if command[0] == 'QUIT':
+					break
+				if command[0] == 'STATS':
+					writer.write(('STATS %s\n' % self.host.format_stats()).encode())
+				elif command[0] == 'PLAY' and 2 <= len(command) <= 3:
+					error = await self._play(reader, writer, command[1:])
+					if error:
+						writer.write(('ERROR %s\n' % error).encode())
+				else:
+					writer.write(b'ERROR unknown command\n')
+				await writer.drain()
+		except ConnectionError:
+			pass
+		finally:
+			self.connections -= 1
+			writer.close()
+
+	async def _play(self, reader, writer, arguments):
+		"""
+		Play a game against a bot with the client, from the arguments of a
+		PLAY command. Return an error message if the arguments are wrong.
+		"""
+		bot = self.bots.get(arguments[0])
+		if bot is None:
+			return 'unknown bot %s' % arguments[0]
+		player_id = arguments[1] if len(arguments) > 1 else '1'
+		if player_id not in ('1', '2'):
+			return 'the player must be 1 or 2'
+		client = _RemotePlayer(reader, writer)
+		observer = _ConnectionObserver(writer, int(player_id))
+		if player_id == '1':
+			await self.host.play_game(client, bot, board_class=self.board_class,
+				observers=[observer])
+		else:
+			await self.host.play_game(bot, client, board_class=self.board_class,
+				observers=[observer])
+		return None
+
+
+##############################################
+# Load test
+##############################################
+
+
+async def _play_client_games(address, port, bot, games, rng, latencies,
+	board_class=connectfour.ConnectFourBoard):
+	"""
+	Connect to a GameServer and play games against bot with random moves.
+	Add the seconds from sending each move to being asked for the next one
+	to latencies. Return the number of moves made by both sides.
+	"""
+	reader, writer = await asyncio.open_connection(address, port)
+	moves = 0
+	try:
+		for game in range(games):
+			writer.write(('PLAY %s %d\n' % (bot, 1 + game % 2)).encode())
+			await writer.drain()
+			board = board_class()
+			sent = None
+			while True:
+				line = await reader.readline()
+				if not line:
+					raise ConnectionError('The server closed the connection')
+				command = line.decode('ascii').split()
+				if command[0] == 'MOVE':
+					board = board.do_move(int(command[2]))
+					moves += 1
+				elif command[0] == 'TURN':
+					if sent is not None:
+						latencies.append(time.perf_counter() - sent)
+					columns = [column for column in range(board.board_width)
+						if board.get_top_of_column(column) >= 0]
+					writer.write(b'%d\n' % columns[int(rng.random() * len(columns))])
+					await writer.drain()
+					sent = time.perf_counter()
+				elif command[0] == 'END':
+					break
+				elif command[0] == 'ERROR':
+					raise ValueError(' '.join(command[1:]))
+		writer.write(b'QUIT\n')
+		await writer.drain()
+	finally:
+		writer.close()
+	return moves
+
+
+async def run_load_test(clients=100, games=2, bot='random', seed=537,
+	host=None, board_class=connectfour.ConnectFourBoard):
+	"""
+	Start a GameServer on a free local port and connect clients clients
+	to it, each of which plays games games against bot with random moves.
+	Return a dictionary of the results: the number of games and moves,
+	the elapsed seconds, the moves per second, and the 50th and 99th
+	percentiles of the client's wait from sending a move to being asked for
+	the next one and of the server's time to get each move from a player.
+	The host should keep every latency (see AsyncGameHost).
+	"""
+	if host is None:
+		host = AsyncGameHost(max_latencies=None)
+	server = GameServer(host, board_class=board_class)
+	listener = await server.start()
+	address, port = listener.sockets[0].getsockname()[:2]
+	rng = random.Random(seed)
+	latencies = []
+	host.reset_stats()
+	start = time.perf_counter()
+	try:
+		moves = await asyncio.gather(*[_play_client_games(address, port, bot,
+			games, random.Random(rng.random()), latencies, board_class)
+			for i in range(clients)])
+	finally:
+		listener.close()
+		await listener.wait_closed()
+	elapsed = time.perf_counter() - start
+	return {
+		'clients': clients,
+		'games': host.games_finished,
+		'moves': sum(moves),
+		'forfeits': host.forfeits,
+		'elapsed': elapsed,
+		'moves_per_sec': sum(moves) / elapsed,
+		'client_p50_ms': percentile(latencies, 0.5) * 1000,
+		'client_p99_ms': percentile(latencies, 0.99) * 1000,
+		'server_p50_ms': host.get_latency(0.5) * 1000,
+		'server_p99_ms': host.get_latency(0.99) * 1000,
+	}
+
+
+def format_load_test(results):
+	"""Return a printable report of the results of run_load_test."""
+	return '\n'.join([
+		'%d clients, %d games, %d moves, %d forfeits in %.2fs' % (
+			results['clients'], results['games'], results['moves'],
+			results['forfeits'], results['elapsed']),
+		'Throughput: %.1f moves/sec' % results['moves_per_sec'],
+		'Client wait per move: p50 %.2f ms, p99 %.2f ms' % (
+			results['client_p50_ms'], results['client_p99_ms']),
+		'Server time per move: p50 %.2f ms, p99 %.2f ms' % (
+			results['server_p50_ms'], results['server_p99_ms']),
+	])
+
+
+async def _serve_forever(host, address, port, board_class):
+	"""Run a GameServer until the process is interrupted."""
+	server = GameServer(host, board_class=board_class)
+	listener = await server.start(address, port)
+	print('Serving on %s:%d' % listener.sockets[0].getsockname()[:2])
+	async with listener:
+		await listener.serve_forever()
+
+
+def main(argv=None):
+	"""Run a server or a load test from the command line."""
+	parser = argparse.ArgumentParser(description='Host Connect Four games.')
+	parser.add_argument('--workers', type=int, default=None,
+		help='number of search processes (default: one per CPU)')
+	parser.add_argument('--timeout', type=float, default=30.0,
+		help='seconds each player has for a move')
+	parser.add_argument('--bitboard', action='store_true',
+		help='use the bitboard implementation')
+	commands = parser.add_subparsers(dest='command')
+	serve = commands.add_parser('serve', help='serve games to clients')
+	serve.add_argument('--address', default='127.0.0.1',
+		help='address to listen on')
+	serve.add_argument('--port', type=int, default=8765, help='port to listen on')
+	load = commands.add_parser('loadtest',
+		help='play many games against a server in this process')
+	load.add_argument('--clients', type=int, default=100,
+		help='number of concurrent clients')
+	load.add_argument('--games', type=int, default=2,
+		help='number of games per client')
+	load.add_argument('--bot', choices=sorted(DEFAULT_BOTS), default='random',
+		help='bot for the clients to play against')
+	load.add_argument('--seed', type=int, default=537,
+		help='seed of the clients\' moves')
+	args = parser.parse_args(argv)
+	if args.command is None:
+		parser.error('a command is required')
+
+	if args.bitboard:
+		board_class = connectfour.BitboardConnectFourBoard
+	else:
+		board_class = connectfour.ConnectFourBoard
+	# A load test reports on every move, while a server only keeps the latest
+	max_latencies = None if args.command == 'loadtest' else 10000
+	host = AsyncGameHost(make_process_executor(args.workers), args.timeout,
+		max_latencies)
+	try:
+		if args.command == 'serve':
+			asyncio.run(_serve_forever(host, args.address, args.port, board_class))
+		else:
+			print(format_load_test(asyncio.run(run_load_test(args.clients,
+				args.games, args.bot, args.seed, host, board_class))))
+	except KeyboardInterrupt:
+		pass
+	finally:
+		host.get_executor().shutdown()
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -2,36 +2,46 @@
 # Name: Remy Oukaour (107122849), Jian Yang (110168771)
 # Email: remy.oukaour@gmail.com, swordyoung@gmail.com
 
+import sys
 import time
 import connectfour
 import basicplayer
+import runner
 
 
-def run_game(player1, player2, board=None, verbose=True):
+def run_game(player1, player2, board=None, verbose=True,
+	board_class=connectfour.ConnectFourBoard):
 	"""Run a game of Connect Four with the two specified players."""
-	game = connectfour.ConnectFourRunner(player1, player2, board)
+	game = runner.ConnectFourRunner(player1, player2, board, board_class)
 	return game.run_game(verbose)
 
 
 if __name__ == '__main__':
 
+	if '--bitboard' in sys.argv:
+		board_class = connectfour.BitboardConnectFourBoard
+	else:
+		board_class = connectfour.ConnectFourBoard
+
 	#run_game(basicplayer.human_player, basicplayer.alpha_beta_player)
 	#exit(0)
 
 	# New vs. Basic
-	tick = time.clock()
-	run_game(basicplayer.new_player, basicplayer.basic_player)
-	tock = time.clock()
+	tick = time.perf_counter()
+	result = run_game(basicplayer.new_player, basicplayer.basic_player,
+		board_class=board_class)
+	tock = time.perf_counter()
 	executionTime = tock - tick
-	print "New vs. Basic:"
-	print "Execution Time:", executionTime
-	print "Nodes Expanded:", basicplayer.minimax_nodesExpanded
+	print("New vs. Basic:")
+	print("Execution Time:", executionTime)
+	print("Nodes Expanded:", result.stats[1].get_nodes_expanded())
 
 	# Alpha-Beta vs. Basic
-	tick = time.clock()
-	run_game(basicplayer.alpha_beta_player, basicplayer.basic_player)
-	tock = time.clock()
+	tick = time.perf_counter()
+	result = run_game(basicplayer.alpha_beta_player, basicplayer.basic_player,
+		board_class=board_class)
+	tock = time.perf_counter()
 	executionTime = tock - tick
-	print "Alpha-Beta vs. Basic:"
-	print "Execution Time:", executionTime
-	print "Nodes Expanded:", basicplayer.alpha_beta_nodesExpanded
+	print("Alpha-Beta vs. Basic:")
+	print("Execution Time:", executionTime)
+	print("Nodes Expanded:", result.stats[1].get_nodes_expanded())
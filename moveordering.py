@@ -0,0 +1,88 @@
+class MoveOrderer(object):
+	"""
+	Order the moves searched at each node of an alpha-beta search, so that
+	the moves most likely to cause a cutoff are searched first.
+
+	Moves are ordered by these heuristics, from most to least important:
+
+	* The hash move: the best move stored in the transposition table for
+	  this position, if there is one.
+	* Killer moves: moves that recently caused a cutoff at the same ply
+	  (distance from the root) in another part of the tree.
+	* The history table: how often, and how deep, each move has caused
+	  a cutoff anywhere in the tree.
+	* Center-first: columns closer to the center of the board, which take
+	  part in more possible winning chains.
+
+	Moves that tie on every heuristic keep the order they were generated in.
+
+	Every cutoff is counted in cutoffs, and cutoffs caused by the first move
+	searched are also counted in first_move_cutoffs. The higher the ratio of
+	the two, the better the ordering.
+	"""
+
+	def __init__(self, center_first=True, killer_moves=True, history=True,
+		hash_move=True, num_killer_moves=2):
+		"""Create a new MoveOrderer using the specified heuristics."""
+		self.center_first = center_first
+		self.use_killer_moves = killer_moves
+		self.use_history = history
+		self.use_hash_move = hash_move
+		self.num_killer_moves = num_killer_moves
+		self.clear()
+
+	def clear(self):
+		"""Forget all killer moves and history, and reset the counters."""
+		self._killer_moves = {}
+		self._history = {}
+		self.cutoffs = 0
+		self.first_move_cutoffs = 0
+
+	def new_search(self):
+		"""
+		Start a new search from a different root. Killer moves are forgotten,
+		since plies are counted from the root, and history is halved so that
+		recent cutoffs count for more.
+		"""
+		self._killer_moves = {}
+		for move in self._history:
+			self._history[move] //= 2
+
+	def first_move_cutoff_rate(self):
+		"""Return the fraction of cutoffs that were caused by the first move."""
+		if not self.cutoffs:
+			return 0.0
+		return float(self.first_move_cutoffs) / self.cutoffs
+
+	def order(self, board, next_moves, ply, hash_move=None):
+		"""
+		Return a list of the (move, new_board) pairs from next_moves,
+		best first.
+		"""
+		killers = self._killer_moves.get(ply, ()) if self.use_killer_moves else ()
+		center = board.board_width // 2
+		def priority(move_and_board):
+			move = move_and_board[0]
+			return (
+				self.use_hash_move and move == hash_move,
+				len(killers) - killers.index(move) if move in killers else 0,
+				self.use_history and self._history.get(move, 0),
+				self.center_first and -abs(center - move))
+		return sorted(next_moves, key=priority, reverse=True)
+
+	def record_cutoff(self, move, ply, depth, index):
+		"""
+		Record that the move at the specified index in the ordering caused
+		a cutoff at the specified ply, with depth plies left to search.
+		"""
+		self.cutoffs += 1
+		if index == 0:
+			self.first_move_cutoffs += 1
+		if self.use_killer_moves:
+			killers = self._killer_moves.setdefault(ply, [])
+			if move in killers:
+				killers.remove(move)
+			killers.insert(0, move)
+			del killers[self.num_killer_moves:]
+		if self.use_history:
+			self._history[move] = self._history.get(move, 0) + depth * depth
@@ -0,0 +1,235 @@
+"""
+Opening books for Connect Four.
+
+An opening book stores the best move of every position up to some number of
+moves into the game, found ahead of time with deep alpha-beta searches. A
+position and its mirror image (with the columns reversed) have mirrored best
+moves, so only one of them is stored.
+
+Build a book, then play with it:
+
+	python openingbook.py book.bin --plies 4 --depth 8
+	player = openingbook.make_book_player('book.bin')
+
+The book file starts with a header (see HEADER_FORMAT), followed by the
+position keys of the stored positions in ascending order, as unsigned 64-bit
+integers, and then the best move of each position, one byte each. The file is
+memory-mapped and searched with a binary search, so opening it takes the same
+time however large it is.
+"""
+
+import argparse
+import mmap
+import multiprocessing
+import struct
+import sys
+import connectfour
+import basicplayer
+import moveordering
+import transposition
+
+MAGIC = b'C4BK'
+VERSION = 1
+# Magic, version, board width, board height, chain length goal, entry count
+HEADER_FORMAT = '<4sHBBBxI'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+KEY_FORMAT = '<Q'
+KEY_SIZE = struct.calcsize(KEY_FORMAT)
+
+
+def get_book_positions(max_plies, board_class=connectfour.ConnectFourBoard):
+	"""
+	Return a list of every position reachable in at most max_plies moves
+	where the game is not over, with only one of each pair of mirror images.
+	"""
+	positions = []
+	seen = set()
+	boards = [board_class()]
+	for ply in range(max_plies + 1):
+		next_boards = []
+		for board in boards:
+			key = board.canonical_key()
+			if key in seen or board.is_game_over():
+				continue
+			seen.add(key)
+			positions.append(board)
+			if ply < max_plies:
+				next_boards.extend(new_board for column, new_board in
+					basicplayer.get_all_next_moves(board))
+		boards = next_boards
+	return positions
+
+
+def _search_position(task):
+	"""
+	Find the best move of one book position in a worker process.
+	Return the canonical key of the position and the move, mirrored to
+	match the key.
+	"""
+	board, depth, eval_fn = task
+	column = basicplayer.alpha_beta_search(board, depth, False, eval_fn=eval_fn,
+		transposition_table=transposition.TranspositionTable(),
+		move_orderer=moveordering.MoveOrderer())
+	key, mirrored = board.canonical_key_and_mirrored()
+	if mirrored:
+		column = board.board_width - 1 - column
+	return key, column
+
+
+def build_opening_book(path, max_plies=4, depth=8,
+	eval_fn=basicplayer.new_evaluate,
+	board_class=connectfour.BitboardConnectFourBoard,
+	processes=None):
+	"""
+	Search every position up to max_plies moves into the game to the
+	specified depth, with the positions split across a pool of worker
+	processes, and write the best moves to an opening book at path.
+	Return the number of positions in the book.
+	"""
+	positions = get_book_positions(max_plies, board_class)
+	tasks = [(board, depth, eval_fn) for board in positions]
+	pool = multiprocessing.Pool(processes)
+	try:
+		entries = pool.map(_search_position, tasks, chunksize=1)
+	finally:
+		pool.terminate()
+		pool.join()
+	board = positions[0]
+	write_opening_book(path, entries, board.board_width, board.board_height,
+		board.get_chain_length_goal())
+	return len(entries)
+
+
+def write_opening_book(path, entries, board_width, board_height,
+	chain_length_goal=4):
+	"""
+	Write an opening book to path from a list of (position key, column)
+	pairs, where each key is canonical.
+	"""
+	if (board_height + 1) * board_width > KEY_SIZE * 8:
+		raise ValueError('Boards of %dx%d do not fit in a book' %
+			(board_width, board_height))
+	entries = sorted(dict(entries).items())
+	with open(path, 'wb') as f:
+		f.write(struct.pack(HEADER_FORMAT, MAGIC, VERSION, board_width,
+			board_height, chain_length_goal, len(entries)))
+		for key, column in entries:
+			f.write(struct.pack(KEY_FORMAT, key))
+		f.write(struct.pack('%dB' % len(entries),
+			*[column for key, column in entries]))
+
+
+class OpeningBook(object):
+	"""A read-only opening book, memory-mapped from a file."""
+
+	def __init__(self, path):
+		"""Open the opening book at path."""
+		with open(path, 'rb') as f:
+			self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		if len(self._map) < HEADER_SIZE:
+			raise ValueError('%s is not an opening book' % path)
+		(magic, version, self.board_width, self.board_height,
+			self.chain_length_goal, self._size) = struct.unpack_from(
+			HEADER_FORMAT, self._map)
+		if magic != MAGIC or version != VERSION:
+			raise ValueError('%s is not an opening book' % path)
+		self._moves_offset = HEADER_SIZE + self._size * KEY_SIZE
+		if len(self._map) < self._moves_offset + self._size:
+			raise ValueError('%s is truncated' % path)
+
+	def close(self):
+		"""Unmap the book file."""
+		self._map.close()
+
+	def __enter__(self):
+		"""Return this book, to be closed at the end of a with statement."""
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		"""Close this book at the end of a with statement."""
+		self.close()
+
+	def __len__(self):
+		"""Return the number of positions in the book."""
+		return self._size
+
+	def _get_key(self, index):
+		"""Return the position key at the specified index."""
+		return struct.unpack_from(KEY_FORMAT, self._map,
+			HEADER_SIZE + index * KEY_SIZE)[0]
+
+	def _find(self, key):
+		"""Return the index of the position key, or -1 if it is not in the book."""
+		low, high = 0, self._size
+		while low < high:
+			middle = (low + high) // 2
+			if self._get_key(middle) < key:
+				low = middle + 1
+			else:
+				high = middle
+		if low < self._size and self._get_key(low) == key:
+			return low
+		return -1
+
+	def lookup(self, board):
+		"""
+		Return the book move of the specified board, or None if the board
+		is not in the book.
+		"""
+		if (board.board_width != self.board_width or
+			board.board_height != self.board_height or
+			board.get_chain_length_goal() != self.chain_length_goal):
+			return None
+		# Book positions always have the usual player to move
+		if board.get_current_player_id() != 1 + board.num_tokens_on_board() % 2:
+			return None
+		key, mirrored = board.canonical_key_and_mirrored()
+		index = self._find(key)
+		if index < 0:
+			return None
+		column = self._map[self._moves_offset + index]
+		if mirrored:
+			column = board.board_width - 1 - column
+		return column
+
+
+def make_book_player(book, fallback=basicplayer.alpha_beta_player):
+	"""
+	Return a Connect Four player callback that plays the moves in book,
+	an OpeningBook or the path of one, and calls fallback once the game
+	leaves the book. The callback's book attribute is the OpeningBook.
+	"""
+	if not isinstance(book, OpeningBook):
+		book = OpeningBook(book)
+	def player(board):
+		column = book.lookup(board)
+		if column is None:
+			return fallback(board)
+		return column
+	player.book = book
+	# Let ConnectFourRunner reset the fallback player's state
+	if hasattr(fallback, 'new_game'):
+		player.new_game = fallback.new_game
+	return player
+
+
+def main(argv=None):
+	"""Build an opening book from the command line."""
+	parser = argparse.ArgumentParser(description='Build a Connect Four opening book.')
+	parser.add_argument('path', help='file to write the book to')
+	parser.add_argument('--plies', type=int, default=4,
+		help='number of moves into the game to store positions for')
+	parser.add_argument('--depth', type=int, default=8,
+		help='depth of the search of each position')
+	parser.add_argument('--processes', type=int, default=None,
+		help='number of worker processes (default: one per CPU)')
+	args = parser.parse_args(argv)
+
+	size = build_opening_book(args.path, args.plies, args.depth,
+		processes=args.processes)
+	print('Wrote %d positions to %s' % (size, args.path))
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
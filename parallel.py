@@ -0,0 +1,231 @@
+import multiprocessing
+import os
+import sys
+import time
+import connectfour
+import basicplayer
+import searchstats
+
+Infinity = basicplayer.Infinity
+
+# Scores of the root moves that workers have finished searching, indexed by
+# the order of the moves; NaN for moves that have not finished. Each worker
+# process gets this array from ParallelSearcher when it starts.
+_root_scores = None
+
+
+def _init_worker(root_scores):
+	"""Initialize a worker process of a ParallelSearcher."""
+	global _root_scores
+	_root_scores = root_scores
+
+
+def _search_root_move(task):
+	"""
+	Search the subtree of one root move in a worker process.
+	Return the index of the move, the score and column of the subtree's
+	best node, the worker's process ID and the SearchStats of the search.
+	"""
+	index, board, depth, eval_fn, get_next_moves_fn, is_terminal_fn = task
+	# Moves that come earlier at the root win ties, so this move can only be
+	# chosen if it scores strictly better than every earlier move. The best
+	# finished earlier score is therefore a safe lower bound for its search.
+	alpha = max([-Infinity] + [score for score in _root_scores[:index]
+		if score == score])
+	stats = searchstats.SearchStats()
+	start = time.time()
+	node = basicplayer.alpha_beta_helper(board, depth - 1, False, -Infinity,
+		-alpha, eval_fn, get_next_moves_fn, is_terminal_fn, ply=1, stats=stats)
+	stats.elapsed = time.time() - start
+	_root_scores[index] = -node.score
+	return index, node.score, node.column, os.getpid(), stats
+
+
+class ParallelSearchResult(object):
+	"""Store the result of a parallel alpha-beta search."""
+
+	def __init__(self, column, score, worker_stats, stats):
+		"""Initialize this search result."""
+		self.column = column
+		self.score = score
+		# Map of worker process IDs to the SearchStats of their searches
+		self.worker_stats = worker_stats
+		# The SearchStats of the whole search, including the root
+		self.stats = stats
+		self.elapsed = stats.elapsed
+
+	def get_worker_nodes(self):
+		"""Return a map of worker process IDs to the nodes they expanded."""
+		return dict((pid, stats.get_nodes_expanded())
+			for pid, stats in self.worker_stats.items())
+
+	def total_nodes(self):
+		"""Return the number of nodes expanded by all workers and the root."""
+		return self.stats.get_nodes_expanded()
+
+	def __str__(self):
+		"""Return a printable string representation of this result."""
+		return 'ParallelSearchResult(%s, %s, %d nodes, %.3fs)' % (
+			self.column, str(self.score), self.total_nodes(), self.elapsed)
+
+	def __repr__(self):
+		"""Return a string representation of this result."""
+		return str(self)
+
+
+class ParallelSearcher(object):
+	"""
+	Run alpha-beta searches with the root moves split across a pool of
+	worker processes.
+
+	Each root move's subtree is searched by one worker. Workers share the
+	scores of the root moves they have finished, and a worker starting on
+	a root move uses the best earlier score as its alpha bound. The chosen
+	move is the same one that basicplayer.alpha_beta_search would choose.
+
+	The evaluation and move generation functions must be defined at the top
+	level of a module, so that they can be sent to the workers.
+	"""
+
+	def __init__(self, processes=None):
+		"""Create a new ParallelSearcher with a pool of worker processes."""
+		self._root_scores = multiprocessing.Array('d', 64)
+		self._pool = multiprocessing.Pool(processes, _init_worker,
+			(self._root_scores,))
+
+	def close(self):
+		"""Shut down the worker processes."""
+		self._pool.terminate()
+		self._pool.join()
+
+	def search(self, board, depth,
+		eval_fn=basicplayer.new_evaluate,
+		get_next_moves_fn=basicplayer.get_all_next_moves,
+		is_terminal_fn=basicplayer.is_terminal):
+		"""
+		Do a parallel alpha-beta search on the specified board to the
+		specified depth.
+		Return a ParallelSearchResult.
+		"""
+		start = time.time()
+		stats = searchstats.SearchStats()
+		stats.count_node(0)
+		if depth <= 0 or is_terminal_fn(board):
+			stats.leaf_evaluations += 1
+			return ParallelSearchResult(None, eval_fn(board), {}, stats)
+		next_moves = list(get_next_moves_fn(board))
+		if len(next_moves) > len(self._root_scores):
+			raise ValueError('Too many root moves: %d' % len(next_moves))
+		for i in range(len(self._root_scores)):
+			self._root_scores[i] = float('nan')
+		tasks = [(i, new_board, depth, eval_fn, get_next_moves_fn, is_terminal_fn)
+			for i, (column, new_board) in enumerate(next_moves)]
+		child_nodes = [None] * len(next_moves)
+		worker_stats = {}
+		for index, score, column, pid, task_stats in self._pool.imap_unordered(
+			_search_root_move, tasks):
+			child_nodes[index] = -basicplayer.Node(score, column)
+			worker_stats.setdefault(pid, searchstats.SearchStats()).merge(task_stats)
+			# Worker time overlaps, so only the wall-clock time is kept below
+			task_stats.elapsed = 0.0
+			stats.merge(task_stats)
+		# Pick the best move exactly as alpha_beta_helper does at the root
+		best_node = basicplayer.Node(-Infinity)
+		for (column, new_board), child_node in zip(next_moves, child_nodes):
+			if child_node > best_node:
+				best_node = basicplayer.Node(child_node.score, column)
+		stats.searches += 1
+		stats.depth = depth
+		stats.elapsed = time.time() - start
+		return ParallelSearchResult(best_node.column, best_node.score,
+			worker_stats, stats)
+
+
+def parallel_alpha_beta_search(board, depth, increment,
+	eval_fn=basicplayer.new_evaluate,
+	get_next_moves_fn=basicplayer.get_all_next_moves,
+	is_terminal_fn=basicplayer.is_terminal,
+	processes=None,
+	stats=None):
+	"""
+	Do an alpha-beta search on the specified board to the specified depth,
+	with the root moves split across a new pool of worker processes.
+	Return the column that the search finds to add a token to.
+
+	If increment is True, increment the global variable
+	basicplayer.alpha_beta_nodesExpanded by the nodes expanded by all workers.
+	If stats is a SearchStats, add the counts of the whole search to it.
+	"""
+	searcher = ParallelSearcher(processes)
+	try:
+		result = searcher.search(board, depth, eval_fn, get_next_moves_fn,
+			is_terminal_fn)
+	finally:
+		searcher.close()
+	if increment:
+		basicplayer.alpha_beta_nodesExpanded += result.total_nodes()
+	if stats is not None:
+		stats.merge(result.stats)
+	return result.column
+
+
+def compare_with_sequential(searcher, board, depth,
+	eval_fn=basicplayer.new_evaluate):
+	"""
+	Search the specified board with both the sequential alpha_beta_search
+	and the ParallelSearcher.
+	Return a dictionary of the node counts (in total and by ply), times and
+	speedup of each.
+	"""
+	stats = searchstats.SearchStats()
+	sequential_column = basicplayer.alpha_beta_search(board, depth, False,
+		eval_fn=eval_fn, stats=stats)
+	sequential_time = stats.elapsed
+	sequential_nodes = stats.get_nodes_expanded()
+	sequential_nodes_by_ply = list(stats.nodes_by_ply)
+	result = searcher.search(board, depth, eval_fn=eval_fn)
+	return {
+		'sequential_column': sequential_column,
+		'parallel_column': result.column,
+		'sequential_nodes': sequential_nodes,
+		'parallel_nodes': result.total_nodes(),
+		'sequential_nodes_by_ply': sequential_nodes_by_ply,
+		'parallel_nodes_by_ply': list(result.stats.nodes_by_ply),
+		'worker_nodes': result.get_worker_nodes(),
+		'sequential_time': sequential_time,
+		'parallel_time': result.elapsed,
+		'speedup': sequential_time / result.elapsed if result.elapsed else 0.0,
+		'node_overhead': float(result.total_nodes()) / sequential_nodes,
+	}
+
+
+# Compare parallel and sequential searches of some opening positions.
+if __name__ == '__main__':
+
+	depth = int(sys.argv[1]) if len(sys.argv) > 1 else 6
+	processes = int(sys.argv[2]) if len(sys.argv) > 2 else None
+	searcher = ParallelSearcher(processes)
+	try:
+		board = connectfour.BitboardConnectFourBoard()
+		for column in (3, 3, 2, 4):
+			comparison = compare_with_sequential(searcher, board, depth)
+			print(board)
+			print('Same move:', (comparison['sequential_column'] ==
+				comparison['parallel_column']))
+			# Nodes by ply only match when every earlier root move finished
+			# first, as they always do with one worker process
+			print('Same nodes by ply:', (comparison['sequential_nodes_by_ply'] ==
+				comparison['parallel_nodes_by_ply']))
+			print('Sequential: %d nodes %s, %.3fs' % (
+				comparison['sequential_nodes'], comparison['sequential_nodes_by_ply'],
+				comparison['sequential_time']))
+			print('Parallel: %d nodes %s, %.3fs' % (comparison['parallel_nodes'],
+				comparison['parallel_nodes_by_ply'], comparison['parallel_time']))
+			for pid, nodes in sorted(comparison['worker_nodes'].items()):
+				print('  Worker %d: %d nodes' % (pid, nodes))
+			print('Speedup: %.2fx, node overhead: %.2fx' % (comparison['speedup'],
+				comparison['node_overhead']))
+			print()
+			board = board.do_move(column)
+	finally:
+		searcher.close()
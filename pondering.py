@@ -0,0 +1,280 @@
+"""
+Pondering: searching on the opponent's time.
+
+After a player moves, the board its opponent faces has at most seven
+children, one of which is the board the player will face next. A pondering
+player searches those replies in a pool of worker processes while the
+opponent thinks, most likely reply first. When the opponent's move arrives,
+the player uses the finished search of that reply (a ponder hit), waits for
+it if it is still running, or searches the board itself if the reply was
+never started; the searches of the other replies are stopped. The searches
+are the same ones the player would run itself, so pondering changes how long
+a move takes but never which move is made.
+
+	player = pondering.PonderingPlayer(depth=4)
+	runner.ConnectFourRunner(player, basicplayer.basic_player).run_game()
+	print(player.format_stats())
+	player.close()
+
+Compare a pondering player against the same player without pondering:
+
+	python pondering.py --games 4 --opponent basic
+"""
+
+import argparse
+import concurrent.futures
+import sys
+import time
+import connectfour
+import basicplayer
+import searchstats
+import tournament
+
+
+# Shared with the worker processes of a PonderingPlayer, which get them from
+# it when they start: every search numbered below _oldest_search is stale and
+# stops at its next leaf, unless it is the search numbered _kept_search
+_oldest_search = None
+_kept_search = None
+
+
+def _init_worker(oldest_search, kept_search):
+	"""Initialize a worker process of a PonderingPlayer."""
+	global _oldest_search, _kept_search
+	_oldest_search = oldest_search
+	_kept_search = kept_search
+
+
+def _search_reply(task):
+	"""
+	Search one board in a worker process.
+	Return the column, the SearchStats and the CPU seconds of the search,
+	or None if the search became stale and was stopped.
+	"""
+	number, board, depth, eval_fn = task
+	def checked_eval_fn(board):
+		if number < _oldest_search.value and number != _kept_search.value:
+			raise basicplayer.SearchTimeout()
+		return eval_fn(board)
+	stats = searchstats.SearchStats()
+	# CPU time, unlike stats.elapsed, does not grow when the worker has to
+	# share the CPU with the opponent
+	start = time.process_time()
+	try:
+		column = basicplayer.alpha_beta_search(board, depth, False,
+			eval_fn=checked_eval_fn, stats=stats)
+	except basicplayer.SearchTimeout:
+		return None
+	return column, stats, time.process_time() - start
+
+
+class PonderingPlayer(object):
+	"""
+	A Connect Four player callback that calls alpha_beta_search with eval_fn
+	and searches the opponent's likely replies in the background after each
+	move. The callback returns the column and the SearchStats of the search,
+	which ran in a worker process on a ponder hit.
+
+	Counters, over every move since the player was created:
+	* moves: the number of moves made
+	* hits: moves whose pondered search had finished
+	* partial_hits: moves whose pondered search was still running, and was
+	  waited for
+	* misses: moves searched from scratch
+	* time_saved: the seconds that pondering took off the moves: for each
+	  move, the time its search takes (the CPU time of a pondered search)
+	  less the time the move took, including the cost of stopping and
+	  starting the pondered searches. Misses only add that cost, so this is
+	  negative when pondering costs more than it saves.
+	"""
+
+	def __init__(self, depth=4, eval_fn=basicplayer.new_evaluate,
+		processes=None, max_replies=None):
+		"""
+		Create a new PonderingPlayer that searches to the specified depth,
+		pondering in a pool of processes worker processes (by default one
+		per CPU) at most max_replies replies to each move (by default all).
+		"""
+		self.depth = depth
+		self.eval_fn = eval_fn
+		self.max_replies = max_replies
+		context = tournament.get_pool_context()
+		self._oldest_search = context.RawValue('q', 0)
+		self._kept_search = context.RawValue('q', -1)
+		self._executor = concurrent.futures.ProcessPoolExecutor(processes,
+			mp_context=context, initializer=_init_worker,
+			initargs=(self._oldest_search, self._kept_search))
+		# Map of the position keys of pondered boards to the numbers and
+		# futures of their searches
+		self._pondering = {}
+		self._next_search = 0
+		self.moves = 0
+		self.hits = 0
+		self.partial_hits = 0
+		self.misses = 0
+		self.time_saved = 0.0
+
+	def __call__(self, board):
+		"""Return the column to play on board and the SearchStats of its search."""
+		start = time.perf_counter()
+		number, search = self._pondering.pop(board.position_key(), (-1, None))
+		self._kept_search.value = number
+		self._stop_pondering()
+		# cancel() fails once a search has started, and then its result is used
+		if search is not None and not search.cancel():
+			if search.done():
+				self.hits += 1
+			else:
+				self.partial_hits += 1
+			column, stats, search_time = search.result()
+		else:
+			self.misses += 1
+			search_start = time.perf_counter()
+			stats = searchstats.SearchStats()
+			column = basicplayer.alpha_beta_search(board, self.depth, True,
+				eval_fn=self.eval_fn, stats=stats)
+			search_time = time.perf_counter() - search_start
+		self.moves += 1
+		self._ponder(board.do_move(column))
+		self.time_saved += search_time - (time.perf_counter() - start)
+		return column, stats
+
+	def _ponder(self, board):
+		"""
+		Start searching the replies to board, the ones worst for this player
+		(by eval_fn) first, since they are the ones the opponent should play.
+		"""
+		if board.is_game_over():
+			return
+		# eval_fn scores each reply for this player, who is to move after it
+		replies = sorted([new_board for column, new_board in
+			basicplayer.get_all_next_moves(board) if not new_board.is_game_over()],
+			key=self.eval_fn)
+		for new_board in replies[:self.max_replies]:
+			number = self._next_search
+			self._next_search += 1
+			self._pondering[new_board.position_key()] = (number,
+				self._executor.submit(_search_reply,
+				(number, new_board, self.depth, self.eval_fn)))
+
+	def _stop_pondering(self):
+		"""
+		Cancel the searches that have not started, and stop the ones that
+		have, except for the kept search.
+		"""
+		self._oldest_search.value = self._next_search
+		for number, search in self._pondering.values():
+			search.cancel()
+		self._pondering.clear()
+
+	def new_game(self):
+		"""Stop pondering the last game; ConnectFourRunner calls this."""
+		self._kept_search.value = -1
+		self._stop_pondering()
+
+	def close(self):
+		"""Stop pondering and shut down the worker processes."""
+		self._kept_search.value = -1
+		self._stop_pondering()
+		self._executor.shutdown()
+
+	def get_hit_rate(self):
+		"""Return the fraction of moves whose search was pondered, in full or in part."""
+		if not self.moves:
+			return 0.0
+		return float(self.hits + self.partial_hits) / self.moves
+
+	def get_time_saved_per_move(self):
+		"""
+		Return the average number of seconds pondering saved per move,
+		which is negative if it cost more than it saved.
+		"""
+		if not self.moves:
+			return 0.0
+		return self.time_saved / self.moves
+
+	def format_stats(self):
+		"""Return a printable summary of the ponder hits and the time saved."""
+		return ('%d moves: %d hits, %d partial hits, %d misses (hit rate %.0f%%), '
+			'%.2f ms saved per move' % (self.moves, self.hits, self.partial_hits,
+			self.misses, self.get_hit_rate() * 100,
+			self.get_time_saved_per_move() * 1000))
+
+	def __str__(self):
+		"""Return a printable string representation of this player."""
+		return 'PonderingPlayer(depth %d, %s)' % (self.depth, self.format_stats())
+
+	def __repr__(self):
+		"""Return a string representation of this player."""
+		return str(self)
+
+
+def compare_pondering(opponent, games=4, depth=4, processes=None,
+	board_class=connectfour.ConnectFourBoard):
+	"""
+	Play games games against opponent with a PonderingPlayer, alternating
+	colors, and the same games, with the same seeds, with alpha_beta_search
+	at depth without pondering. Return the PonderingPlayer, the average
+	seconds per move of each player, and whether every game had the same
+	moves both times.
+	"""
+	def plain_player(board):
+		stats = searchstats.SearchStats()
+		return basicplayer.alpha_beta_search(board, depth, True, stats=stats), stats
+	player = PonderingPlayer(depth, processes=processes)
+	times = {}
+	moves = {}
+	try:
+		for name, callback in (('pondering', player), ('plain', plain_player)):
+			times[name] = []
+			moves[name] = []
+			for game in range(games):
+				if game % 2 == 0:
+					players, player_id = (callback, opponent), 1
+				else:
+					players, player_id = (opponent, callback), 2
+				result = tournament.play_game(players[0], players[1], seed=game,
+					board_class=board_class)
+				times[name].extend(result.get_move_times(player_id))
+				moves[name].append(result.moves)
+	finally:
+		player.close()
+	return (player, sum(times['pondering']) / len(times['pondering']),
+		sum(times['plain']) / len(times['plain']),
+		moves['pondering'] == moves['plain'])
+
+
+def main(argv=None):
+	"""Compare a pondering player with a plain one from the command line."""
+	opponents = {
+		'random': basicplayer.random_player,
+		'basic': basicplayer.basic_player,
+		'alpha_beta': basicplayer.alpha_beta_player,
+	}
+	parser = argparse.ArgumentParser(description='Measure the effect of pondering.')
+	parser.add_argument('--games', type=int, default=4, help='number of games')
+	parser.add_argument('--depth', type=int, default=4, help='search depth')
+	parser.add_argument('--opponent', choices=sorted(opponents), default='basic',
+		help='player to play against')
+	parser.add_argument('--processes', type=int, default=None,
+		help='number of pondering processes (default: one per CPU)')
+	parser.add_argument('--bitboard', action='store_true',
+		help='use the bitboard implementation')
+	args = parser.parse_args(argv)
+
+	if args.bitboard:
+		board_class = connectfour.BitboardConnectFourBoard
+	else:
+		board_class = connectfour.ConnectFourBoard
+	player, pondering_time, plain_time, same_moves = compare_pondering(
+		opponents[args.opponent], args.games, args.depth, args.processes,
+		board_class)
+	print(player.format_stats())
+	print('%.2f ms per move with pondering, %.2f ms without' % (
+		pondering_time * 1000, plain_time * 1000))
+	print('Same moves with and without pondering: %s' % same_moves)
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
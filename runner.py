@@ -0,0 +1,227 @@
+import time
+import connectfour
+import searchstats
+
+
+class GameObserver(object):
+	"""
+	Receive the events of games run by a ConnectFourRunner.
+	Subclasses override the methods of the events they are interested in;
+	the methods of this class do nothing.
+	"""
+
+	def on_game_start(self, board):
+		"""Called with the initial board at the start of a game."""
+		pass
+
+	def on_move(self, player_id, column, board, elapsed):
+		"""
+		Called after the specified player added a token to column, with
+		the new board and the seconds the player's callback took.
+		"""
+		pass
+
+	def on_invalid_move(self, player_id, exception):
+		"""
+		Called with the InvalidMoveException raised when the specified player
+		attempted an illegal move. The player is asked for another move,
+		unless this method raises the exception again, which ends the game:
+		the player loses by forfeit.
+		"""
+		pass
+
+	def on_game_over(self, result):
+		"""Called with the GameResult at the end of a game."""
+		pass
+
+
+class PrintingObserver(GameObserver):
+	"""
+	A GameObserver that prints each board, move and the winner of a game.
+	This is the output ConnectFourRunner.run_game gives when verbose is True.
+	"""
+
+	def on_game_start(self, board):
+		"""Print the initial board."""
+		print(board)
+
+	def on_move(self, player_id, column, board, elapsed):
+		"""Print the move, and the new board unless the game is over."""
+		print('Player %s (%s) puts a token in column %s' %
+			(player_id, board.board_symbols[player_id], column))
+		if not board.is_game_over():
+			print(board)
+
+	def on_invalid_move(self, player_id, exception):
+		"""Print the exception."""
+		print(exception)
+		print('Illegal move attempted. Please try again.')
+
+	def on_game_over(self, result):
+		"""Print the winner and the final board."""
+		if result.forfeit:
+			print('Win for %s by forfeit!' %
+				result.board.board_symbols[result.winner])
+		elif result.winner:
+			print('Win for %s!' % result.board.board_symbols[result.winner])
+		else:
+			print("It's a tie! No winner is declared.")
+		print(result.board)
+
+
+class GameResult(object):
+	"""
+	Store the result of a game run by a ConnectFourRunner.
+
+	* winner: the player ID of the winner, 0 for a tie, or None while the
+	  game is not over
+	* moves: the columns played, in order
+	* move_times: the seconds each player's callback took to choose each move
+	* stats: a dictionary mapping each player ID to the SearchStats of that
+	  player, added up over the game
+	* first_player: the ID of the player who made the first move
+	* board: the final board
+	* forfeit: the ID of the player who lost by forfeit, or None
+	"""
+
+	def __init__(self, board):
+		"""Create a new GameResult for a game starting with the specified board."""
+		self.winner = None
+		self.moves = []
+		self.move_times = []
+		self.stats = {1: searchstats.SearchStats(), 2: searchstats.SearchStats()}
+		self.first_player = board.get_current_player_id()
+		self.board = board
+		self.forfeit = None
+
+	def get_moves(self, player_id):
+		"""Return the columns played by the specified player, in order."""
+		start = 0 if player_id == self.first_player else 1
+		return self.moves[start::2]
+
+	def get_move_times(self, player_id):
+		"""Return the seconds the specified player took for each move."""
+		start = 0 if player_id == self.first_player else 1
+		return self.move_times[start::2]
+
+	def __str__(self):
+		"""Return a printable string representation of this result."""
+		return 'GameResult(winner %s, %d moves)' % (self.winner, len(self.moves))
+
+	def __repr__(self):
+		"""Return a string representation of this result."""
+		return str(self)
+
+
+class ConnectFourRunner(object):
+	"""
+	Runs a game of Connect Four.
+
+	The rules of this Connect Four game are as follows:
+
+	* The game is a two-player game. Players take turns adding tokens to
+	  the board.
+	* When a token is added to the board, it is added to a particular column.
+	  It "falls" to the unoccupied cell in the column with the largest index.
+	* The game ends when one of the two players has four consecutive tokens
+	  in a row (either horizontally, vertically, or on 45-degree diagonals),
+	  or when the board is completely filled. If the game ends with a player
+	  having four consecutive diagonal tokens, that player is the winner.
+
+	The game runner is implemented via callbacks: The two players specify
+	callbacks to be called when it's their turn. The callback is passed
+	the current board, which is immutable, so it is not copied. The callback
+	functions must return integers corresponding to the columns they want to
+	drop a token into, or (column, stats) pairs where stats is the SearchStats
+	of the search that chose the column. The stats of each player are added
+	up over the game. If a callback has a new_game attribute, it is called
+	with no arguments at the start of each game.
+
+	The events of the game are sent to a list of GameObserver objects. If no
+	observers are given, run_game prints the game when verbose is True and
+	prints nothing otherwise.
+
+	If no initial board is given, an empty board of type board_class is used;
+	pass connectfour.BitboardConnectFourBoard to play with the bitboard
+	implementation.
+	"""
+
+	def __init__(self, player1_callback, player2_callback, board=None,
+		board_class=connectfour.ConnectFourBoard, observers=None):
+		"""Create a new ConnectFourRunner."""
+		self._board = board or board_class()
+		self.player1_callback = player1_callback
+		self.player2_callback = player2_callback
+		self.observers = observers
+		self._result = GameResult(self._board)
+
+	def get_board(self):
+		"""Return the current game board."""
+		return self._board
+
+	def get_result(self):
+		"""Return the GameResult of the last game, which may be unfinished."""
+		return self._result
+
+	def get_stats(self, player_id):
+		"""
+		Return the SearchStats of the specified player, added up over the
+		moves of the last game.
+		"""
+		return self._result.stats[player_id]
+
+	def run_game(self, verbose=True):
+		"""
+		Run the test defined by this test runner.
+		Return a GameResult.
+
+		If an observer's on_invalid_move raises the InvalidMoveException
+		again, the game ends there, and the player who made the illegal
+		move loses by forfeit.
+		"""
+		observers = self.observers
+		if observers is None:
+			observers = [PrintingObserver()] if verbose else []
+		callbacks = {1: self.player1_callback, 2: self.player2_callback}
+		for callback in (self.player1_callback, self.player2_callback):
+			# Players may keep state across moves, but not across games
+			new_game = getattr(callback, 'new_game', None)
+			if new_game is not None:
+				new_game()
+		result = self._result = GameResult(self._board)
+		for observer in observers:
+			observer.on_game_start(self._board)
+		while not self._board.is_game_over():
+			player_id = self._board.get_current_player_id()
+			callback = callbacks[player_id]
+			while True:
+				start = time.time()
+				new_column = callback(self._board)
+				elapsed = time.time() - start
+				if isinstance(new_column, tuple):
+					new_column, stats = new_column
+					result.stats[player_id].merge(stats)
+				try:
+					self._board = self._board.do_move(new_column)
+					break
+				except connectfour.InvalidMoveException as ex:
+					try:
+						for observer in observers:
+							observer.on_invalid_move(player_id, ex)
+					except connectfour.InvalidMoveException:
+						result.forfeit = player_id
+						break
+			if result.forfeit is not None:
+				break
+			result.moves.append(new_column)
+			result.move_times.append(elapsed)
+			result.board = self._board
+			for observer in observers:
+				observer.on_move(player_id, new_column, self._board, elapsed)
+		if result.forfeit is not None:
+			result.winner = self._board.get_opposite_player_id()
+		else:
+			result.winner = self._board.is_win()
+		for observer in observers:
+			observer.on_game_over(result)
+		return result
@@ -0,0 +1,114 @@
+class SearchStats(object):
+	"""
+	Count the work done by one or more searches.
+
+	Each search fills in its own SearchStats, so that searches running at the
+	same time (in threads or other processes) can be told apart. The stats of
+	several searches, such as all the moves of one player in a game, can be
+	added together with merge.
+
+	Counters:
+	* nodes_by_ply: the number of nodes expanded at each distance from the root
+	* leaf_evaluations: the number of times eval_fn was called
+	* terminal_hits: the number of nodes where the game was over
+	* cutoffs: the number of alpha-beta cutoffs
+	* re_searches: the number of nodes searched again with a wider window
+	* table_hits, table_misses, table_collisions: transposition table lookups
+	* searches: the number of searches counted
+	* depth: the deepest search depth that was completed
+	* elapsed: the total time spent searching, in seconds
+	"""
+
+	def __init__(self):
+		"""Create a new SearchStats with every counter at zero."""
+		self.nodes_by_ply = []
+		self.leaf_evaluations = 0
+		self.terminal_hits = 0
+		self.cutoffs = 0
+		self.re_searches = 0
+		self.table_hits = 0
+		self.table_misses = 0
+		self.table_collisions = 0
+		self.searches = 0
+		self.depth = 0
+		self.elapsed = 0.0
+
+	def count_node(self, ply):
+		"""Count a node expanded at the specified ply."""
+		if ply >= len(self.nodes_by_ply):
+			# Searches may start below the root, as the workers of
+			# parallel.ParallelSearcher do
+			self.nodes_by_ply.extend([0] * (ply + 1 - len(self.nodes_by_ply)))
+		self.nodes_by_ply[ply] += 1
+
+	def get_nodes_expanded(self):
+		"""Return the total number of nodes expanded."""
+		return sum(self.nodes_by_ply)
+
+	def get_branching_factor(self):
+		"""
+		Return the average number of children searched below each node that
+		was not a leaf.
+		"""
+		interior_nodes = self.get_nodes_expanded() - self.leaf_evaluations
+		if interior_nodes <= 0:
+			return 0.0
+		# Every node but a root is the child of an interior node
+		root_nodes = self.nodes_by_ply[0]
+		return float(self.get_nodes_expanded() - root_nodes) / interior_nodes
+
+	def get_nodes_per_second(self):
+		"""Return the number of nodes expanded per second of searching."""
+		if not self.elapsed:
+			return 0.0
+		return self.get_nodes_expanded() / self.elapsed
+
+	def merge(self, other):
+		"""Add the counters of another SearchStats to this one and return it."""
+		for ply, nodes in enumerate(other.nodes_by_ply):
+			if ply < len(self.nodes_by_ply):
+				self.nodes_by_ply[ply] += nodes
+			else:
+				self.nodes_by_ply.append(nodes)
+		self.leaf_evaluations += other.leaf_evaluations
+		self.terminal_hits += other.terminal_hits
+		self.cutoffs += other.cutoffs
+		self.re_searches += other.re_searches
+		self.table_hits += other.table_hits
+		self.table_misses += other.table_misses
+		self.table_collisions += other.table_collisions
+		self.searches += other.searches
+		self.depth = max(self.depth, other.depth)
+		self.elapsed += other.elapsed
+		return self
+
+	def as_dict(self):
+		"""Return the counters and derived statistics as a dictionary."""
+		return {
+			'nodes_expanded': self.get_nodes_expanded(),
+			'nodes_by_ply': list(self.nodes_by_ply),
+			'leaf_evaluations': self.leaf_evaluations,
+			'terminal_hits': self.terminal_hits,
+			'cutoffs': self.cutoffs,
+			're_searches': self.re_searches,
+			'table_hits': self.table_hits,
+			'table_misses': self.table_misses,
+			'table_collisions': self.table_collisions,
+			'searches': self.searches,
+			'depth': self.depth,
+			'branching_factor': self.get_branching_factor(),
+			'elapsed': self.elapsed,
+			'nodes_per_second': self.get_nodes_per_second(),
+		}
+
+	def __str__(self):
+		"""Return a printable string representation of these stats."""
+		return ('SearchStats(%d nodes, %d leaves, %d terminal, %d cutoffs, '
+			'branching %.2f, %.3fs, %.0f nodes/s)' % (self.get_nodes_expanded(),
+			self.leaf_evaluations, self.terminal_hits, self.cutoffs,
+			self.get_branching_factor(), self.elapsed,
+			self.get_nodes_per_second()))
+
+	def __repr__(self):
+		"""Return a string representation of these stats."""
+		return str(self)
@@ -0,0 +1,238 @@
+"""
+An exact solver for Connect Four endgames.
+
+Near the end of a game few empty cells are left, and the whole game tree
+below a board can be searched instead of a few plies of it. The solver does
+that with null-window alpha-beta searches, narrowing the range of possible
+scores like MTD(f) until the exact score is known.
+
+Scores count from the point of view of the player to move. A board where the
+player to move can win scores the number of empty cells left after the
+winning move, plus 1, so that faster wins score higher; a board where the
+opponent can win scores the negative of the opponent's score; and a draw
+scores 0.
+"""
+
+import sys
+import time
+import connectfour
+import basicplayer
+import searchstats
+import transposition
+
+
+class SolverResult(object):
+	"""Store the result of solving a board."""
+
+	def __init__(self, column, score, empty_cells, stats):
+		"""Initialize this solver result."""
+		self.column = column
+		self.score = score
+		self.empty_cells = empty_cells
+		self.stats = stats
+
+	def get_outcome(self):
+		"""Return 'win', 'loss' or 'draw' for the player to move."""
+		if self.score > 0:
+			return 'win'
+		if self.score < 0:
+			return 'loss'
+		return 'draw'
+
+	def get_moves_to_end(self):
+		"""
+		Return the number of moves left in the game if both players play
+		perfectly, including the move of this result.
+		"""
+		if self.score > 0:
+			return self.empty_cells - self.score + 1
+		if self.score < 0:
+			return self.empty_cells + self.score + 1
+		return self.empty_cells
+
+	def __str__(self):
+		"""Return a printable string representation of this result."""
+		return 'SolverResult(%s in %d moves, column %s, %d nodes, %.3fs)' % (
+			self.get_outcome(), self.get_moves_to_end(), self.column,
+			self.stats.get_nodes_expanded(), self.stats.elapsed)
+
+	def __repr__(self):
+		"""Return a string representation of this result."""
+		return str(self)
+
+
+def get_empty_cells(board):
+	"""Return the number of empty cells on the board."""
+	return board.board_width * board.board_height - board.num_tokens_on_board()
+
+
+def _column_order(board_width):
+	"""Return the columns of a board, from the center out."""
+	center = board_width // 2
+	return sorted(range(board_width), key=lambda column: abs(center - column))
+
+
+def _negamax(board, alpha, beta, transposition_table, columns, ply, stats):
+	"""
+	Search the whole game tree below the specified board with alpha-beta
+	pruning. Return the score of the board and the column of the best move.
+
+	The score is exact if it falls inside the (alpha, beta) window. If it is
+	at most alpha, it is an upper bound on the exact score, and if it is at
+	least beta, it is a lower bound.
+	"""
+	stats.count_node(ply)
+	empty_cells = get_empty_cells(board)
+	if board.is_win():
+		# The opponent won with the last move
+		stats.leaf_evaluations += 1
+		stats.terminal_hits += 1
+		return -(empty_cells + 1), None
+	if not empty_cells:
+		stats.leaf_evaluations += 1
+		stats.terminal_hits += 1
+		return 0, None
+	next_moves = [(column, board.do_move(column)) for column in columns
+		if board.get_top_of_column(column) >= 0]
+	for column, new_board in next_moves:
+		if new_board.is_win():
+			return empty_cells, column
+	# Without an immediate win, the soonest possible win is on the next move
+	beta = min(beta, max(empty_cells - 2, 0))
+	if alpha >= beta:
+		return beta, None
+	hash_move = None
+	entry = transposition_table.lookup(board)
+	if entry is not None:
+		hash_move = entry.move
+		if entry.bound == transposition.EXACT:
+			return entry.score, entry.move
+		if entry.bound == transposition.LOWER_BOUND:
+			alpha = max(alpha, entry.score)
+		else:
+			beta = min(beta, entry.score)
+		if alpha >= beta:
+			return entry.score, entry.move
+		next_moves.sort(key=lambda move: move[0] != hash_move)
+	original_alpha = alpha
+	best_score = -sys.maxsize
+	best_column = None
+	for column, new_board in next_moves:
+		score = -_negamax(new_board, -beta, -alpha, transposition_table, columns,
+			ply + 1, stats)[0]
+		if score > best_score:
+			best_score = score
+			best_column = column
+			alpha = max(alpha, score)
+			if alpha >= beta:
+				stats.cutoffs += 1
+				break
+	if best_score <= original_alpha:
+		bound = transposition.UPPER_BOUND
+	elif best_score >= beta:
+		bound = transposition.LOWER_BOUND
+	else:
+		bound = transposition.EXACT
+	# Every board is searched to the end of the game, so depth is unused
+	transposition_table.store(board, empty_cells, best_score, bound, best_column)
+	return best_score, best_column
+
+
+def solve(board, transposition_table=None, stats=None):
+	"""
+	Find the exact score of the specified board and the best move.
+	Return a SolverResult, whose column is None if the game is over.
+
+	The score is narrowed down with searches of null (alpha, alpha + 1)
+	windows, each of which only tells whether the score is above or below
+	alpha; such searches cut off far more often than a search of the full
+	window. Results are stored in the transposition table, so later searches
+	of the same positions are cheap; a new table is used if none is given.
+
+	If stats is a SearchStats, add the counts of the solve to it.
+	The board must use the standard rules, not longest_streak_to_win.
+	"""
+	start = time.time()
+	if transposition_table is None:
+		transposition_table = transposition.TranspositionTable(2**18)
+	solve_stats = searchstats.SearchStats()
+	table_counters = transposition_table.get_counters()
+	columns = _column_order(board.board_width)
+	empty_cells = get_empty_cells(board)
+	low, high = -(empty_cells + 1), empty_cells
+	while low < high:
+		middle = low + (high - low) // 2
+		# Test windows closer to 0 first, as most scores are small
+		if middle <= 0 and low // 2 < middle:
+			middle = low // 2
+		elif middle >= 0 and high // 2 > middle:
+			middle = high // 2
+		score = _negamax(board, middle, middle + 1, transposition_table, columns,
+			0, solve_stats)[0]
+		if score <= middle:
+			high = score
+		else:
+			low = score
+	column = None
+	if not board.is_game_over():
+		# The best move is the first one whose score is at least the exact score
+		for column in columns:
+			if board.get_top_of_column(column) < 0:
+				continue
+			new_board = board.do_move(column)
+			score = -_negamax(new_board, -low, -low + 1, transposition_table,
+				columns, 1, solve_stats)[0]
+			if score >= low:
+				break
+	hits, misses, collisions = transposition_table.get_counters()
+	solve_stats.table_hits += hits - table_counters[0]
+	solve_stats.table_misses += misses - table_counters[1]
+	solve_stats.table_collisions += collisions - table_counters[2]
+	solve_stats.searches += 1
+	solve_stats.depth = empty_cells
+	solve_stats.elapsed = time.time() - start
+	if stats is not None:
+		stats.merge(solve_stats)
+	return SolverResult(column, low, empty_cells, solve_stats)
+
+
+def make_solver_player(fallback=basicplayer.alpha_beta_player,
+	max_empty_cells=14, table_size=2**18):
+	"""
+	Return a Connect Four player callback that calls fallback until at most
+	max_empty_cells cells are empty, and solves the board from then on.
+	The callback returns the column and the SearchStats of the search, and
+	its last_result attribute is the SolverResult of the last board it solved.
+	"""
+	table = transposition.TranspositionTable(table_size)
+	def player(board):
+		if get_empty_cells(board) > max_empty_cells:
+			return fallback(board)
+		result = solve(board, table)
+		player.last_result = result
+		return result.column, result.stats
+	def new_game():
+		# Solved positions stay solved, so the table is kept between games
+		player.last_result = None
+		fallback_new_game = getattr(fallback, 'new_game', None)
+		if fallback_new_game is not None:
+			fallback_new_game()
+	player.transposition_table = table
+	player.last_result = None
+	player.new_game = new_game
+	return player
+
+
+# Solve some positions from a game between two players.
+if __name__ == '__main__':
+
+	max_empty_cells = int(sys.argv[1]) if len(sys.argv) > 1 else 14
+	board = connectfour.BitboardConnectFourBoard()
+	while get_empty_cells(board) > max_empty_cells and not board.is_game_over():
+		board = board.do_move(basicplayer.alpha_beta_player(board)[0])
+	print(board)
+	while not board.is_game_over():
+		result = solve(board)
+		print('Player %d: %s' % (board.get_current_player_id(), result))
+		board = board.do_move(result.column)
+	print(board)
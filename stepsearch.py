@@ -0,0 +1,364 @@
+"""
+Alpha-beta searches that can be paused and resumed.
+
+alpha_beta_helper recurses, so a search runs to the end once it starts: it
+can only be stopped by raising an exception, which throws away everything it
+found. An AlphaBetaSearch keeps the nodes it is searching on a stack of its
+own instead, and expands a given number of nodes at a time. Between steps it
+holds its whole state, so a scheduler can run many searches side by side,
+stop one as soon as its time runs out and carry on with it later:
+
+	search = stepsearch.AlphaBetaSearch(board, 6)
+	while not search.step(1000):
+		(do something else)
+	column = search.get_column()
+
+The search expands the same nodes in the same order as alpha_beta_search
+with the same arguments, so it finds the same column and counts the same
+nodes. Run this module to check that on some positions and to compare the
+speed of the two searches:
+
+	python stepsearch.py
+"""
+
+import sys
+import time
+import connectfour
+import basicplayer
+import searchstats
+import transposition
+
+Infinity = basicplayer.Infinity
+Node = basicplayer.Node
+
+
+class _Frame(object):
+	"""Store the state of one node on the stack of an AlphaBetaSearch."""
+
+	# A frame is created for every node searched, so frames have no __dict__
+	__slots__ = ('board', 'depth', 'alpha', 'beta', 'ply', 'original_alpha',
+		'best_node', 'moves', 'index', 'column', 'new_board', 'null_window')
+
+	def __init__(self, board, depth, alpha, beta, ply):
+		"""Create a frame for a node that has not been expanded yet."""
+		self.board = board
+		self.depth = depth
+		self.alpha = alpha
+		self.beta = beta
+		self.ply = ply
+		# The iterator of the node's moves, once it has been expanded
+		self.moves = None
+		self.index = -1
+		# Whether the child being searched has a null window, and has to be
+		# searched again if it scores inside the (alpha, beta) window
+		self.null_window = False
+
+
+class AlphaBetaSearch(object):
+	"""
+	An alpha-beta search of a board to a fixed depth, with an explicit stack,
+	that is run a number of nodes at a time with step.
+
+	The arguments are the same as those of basicplayer.alpha_beta_search,
+	except that there is no aspiration window. Searches that run side by side
+	should have their own transposition tables and move orderers, since
+	each search's order of lookups and cutoffs decides what it finds in them.
+	"""
+
+	def __init__(self, board, depth, increment=False,
+		eval_fn=basicplayer.new_evaluate,
+		get_next_moves_fn=basicplayer.get_all_next_moves,
+		is_terminal_fn=basicplayer.is_terminal,
+		transposition_table=None,
+		move_orderer=None,
+		stats=None,
+		symmetry=False,
+		pvs=False):
+		"""Create a new AlphaBetaSearch, which starts with the first step."""
+		if symmetry:
+			get_next_moves_fn = basicplayer.skip_mirrored_moves(get_next_moves_fn)
+		self.board = board
+		self.depth = depth
+		self.increment = increment
+		self.eval_fn = eval_fn
+		self.get_next_moves_fn = get_next_moves_fn
+		self.is_terminal_fn = is_terminal_fn
+		self.transposition_table = transposition_table
+		self.move_orderer = move_orderer
+		self.stats = stats
+		self.pvs = pvs
+		self.nodes = 0
+		self.elapsed = 0.0
+		self._stack = [_Frame(board, depth, -Infinity, Infinity, 0)]
+		self._node = None
+		self._table_counters = None
+
+	def is_done(self):
+		"""Return whether the search has finished."""
+		return self._node is not None
+
+	def get_node(self):
+		"""Return the best node of the search, or None if it has not finished."""
+		return self._node
+
+	def get_column(self):
+		"""Return the best column of the search, or None if it has not finished."""
+		if self._node is None:
+			return None
+		return self._node.column
+
+	def step(self, max_nodes=1000):
+		"""
+		Expand at most max_nodes more nodes, which must be at least 1.
+		Return whether the search has finished.
+		"""
+		if max_nodes < 1:
+			raise ValueError('A step must expand at least 1 node, not %d' %
+				max_nodes)
+		if self._node is not None:
+			return True
+		start = time.time()
+		if self._table_counters is None:
+			self._start_search()
+		stack = self._stack
+		pvs = self.pvs
+		stats = self.stats
+		move_orderer = self.move_orderer
+		eval_fn = self.eval_fn
+		is_terminal_fn = self.is_terminal_fn
+		increment = self.increment
+		nodes = 0
+		# The node returned by the last child searched, from the point of
+		# view of its parent, the frame on top of the stack
+		result = None
+		while stack:
+			frame = stack[-1]
+			new_board = None
+			if result is not None:
+				child_node = -result
+				result = None
+				if frame.null_window:
+					frame.null_window = False
+					if frame.alpha < child_node.score < frame.beta:
+						if stats is not None:
+							stats.re_searches += 1
+						new_board = frame.new_board
+						alpha, beta = -frame.beta, -frame.alpha
+				if new_board is None and child_node > frame.best_node:
+					frame.best_node = Node(child_node.score, frame.column)
+					frame.alpha = max(frame.alpha, child_node.score)
+					if frame.alpha >= frame.beta:
+						if stats is not None:
+							stats.cutoffs += 1
+						if move_orderer is not None:
+							move_orderer.record_cutoff(frame.column, frame.ply,
+								frame.depth, frame.index)
+						result = self._finish(frame)
+						stack.pop()
+						continue
+			elif frame.moves is None:
+				# Only stop before a node is expanded, so that no result is
+				# ever left to pass down when the step ends
+				if nodes >= max_nodes:
+					break
+				nodes += 1
+				result = self._expand(frame)
+				if result is not None:
+					stack.pop()
+					continue
+			if new_board is None:
+				move = next(frame.moves, None)
+				if move is None:
+					result = self._finish(frame)
+					stack.pop()
+					continue
+				frame.index += 1
+				frame.column, new_board = move
+				if pvs and frame.index > 0 and frame.alpha != -Infinity:
+					frame.null_window = True
+					frame.new_board = new_board
+					alpha, beta = -frame.alpha - 1, -frame.alpha
+				else:
+					alpha, beta = -frame.beta, -frame.alpha
+			depth = frame.depth - 1
+			ply = frame.ply + 1
+			if nodes < max_nodes and (depth <= 0 or is_terminal_fn(new_board)):
+				# Leaves are evaluated at once, without a frame of their own
+				nodes += 1
+				if increment:
+					basicplayer.alpha_beta_nodesExpanded += 1
+				if stats is not None:
+					stats.count_node(ply)
+					basicplayer._count_leaf(stats, depth)
+				result = Node(eval_fn(new_board))
+			else:
+				stack.append(_Frame(new_board, depth, alpha, beta, ply))
+		self.nodes += nodes
+		self.elapsed += time.time() - start
+		if not stack:
+			self._node = result
+			self._end_search()
+			return True
+		return False
+
+	def run(self, deadline=None, step_nodes=1000):
+		"""
+		Run the search until it finishes, or until the first step that ends
+		after deadline (in seconds, as returned by time.time()), if given.
+		Return whether the search has finished.
+		"""
+		while not self.step(step_nodes):
+			if deadline is not None and time.time() >= deadline:
+				return False
+		return True
+
+	def _start_search(self):
+		"""Prepare the transposition table and move orderer for the first step."""
+		if self.transposition_table is not None:
+			self.transposition_table.new_search()
+			self._table_counters = self.transposition_table.get_counters()
+		else:
+			self._table_counters = ()
+		if self.move_orderer is not None:
+			self.move_orderer.new_search()
+
+	def _end_search(self):
+		"""Count the finished search in the stats and the global counters."""
+		if self.transposition_table is not None:
+			hits, misses, collisions = basicplayer._count_table_lookups(
+				self.transposition_table, self._table_counters, self.stats)
+			if self.increment:
+				basicplayer.alpha_beta_tableHits += hits
+				basicplayer.alpha_beta_tableMisses += misses
+				basicplayer.alpha_beta_tableCollisions += collisions
+		if self.stats is not None:
+			self.stats.searches += 1
+			self.stats.depth = max(self.stats.depth, self.depth)
+			self.stats.elapsed += self.elapsed
+
+	def _expand(self, frame):
+		"""
+		Expand the node of frame, as alpha_beta_helper does on entry.
+		Return the node's result if it needs no children searched, and
+		otherwise None, with the frame ready for its first child.
+		"""
+		if self.increment:
+			basicplayer.alpha_beta_nodesExpanded += 1
+		stats = self.stats
+		board = frame.board
+		depth = frame.depth
+		if stats is not None:
+			stats.count_node(frame.ply)
+		if depth <= 0 or self.is_terminal_fn(board):
+			if stats is not None:
+				basicplayer._count_leaf(stats, depth)
+			return Node(self.eval_fn(board))
+		hash_move = None
+		if self.transposition_table is not None:
+			entry = self.transposition_table.lookup(board)
+			if entry is not None:
+				hash_move = entry.move
+			if entry is not None and entry.depth >= depth:
+				if entry.bound == transposition.EXACT:
+					return Node(entry.score, entry.move)
+				if entry.bound == transposition.LOWER_BOUND:
+					frame.alpha = max(frame.alpha, entry.score)
+				else:
+					frame.beta = min(frame.beta, entry.score)
+				if frame.alpha >= frame.beta:
+					return Node(entry.score, entry.move)
+		frame.original_alpha = frame.alpha
+		frame.best_node = Node(-Infinity)
+		next_moves = self.get_next_moves_fn(board)
+		if self.move_orderer is not None:
+			next_moves = self.move_orderer.order(board, next_moves, frame.ply,
+				hash_move)
+		frame.moves = iter(next_moves)
+		return None
+
+	def _finish(self, frame):
+		"""
+		Store the result of the node of frame, whose children have been
+		searched, in the transposition table. Return the node's result.
+		"""
+		best_node = frame.best_node
+		if self.transposition_table is not None:
+			if best_node.score <= frame.original_alpha:
+				bound = transposition.UPPER_BOUND
+			elif best_node.score >= frame.beta:
+				bound = transposition.LOWER_BOUND
+			else:
+				bound = transposition.EXACT
+			self.transposition_table.store(frame.board, frame.depth,
+				best_node.score, bound, best_node.column)
+		return best_node
+
+	def __str__(self):
+		"""Return a printable string representation of this search."""
+		if self._node is None:
+			return 'AlphaBetaSearch(depth %d, %d nodes, running)' % (self.depth,
+				self.nodes)
+		return 'AlphaBetaSearch(depth %d, %d nodes, column %s)' % (self.depth,
+			self.nodes, self._node.column)
+
+	def __repr__(self):
+		"""Return a string representation of this search."""
+		return str(self)
+
+
+def interleave(searches, step_nodes=1000, deadline=None):
+	"""
+	Step the searches in turn, step_nodes nodes at a time, until every one
+	has finished, or until deadline (in seconds, as returned by time.time())
+	has passed. Return the list of the searches that have not finished.
+	"""
+	running = [search for search in searches if not search.is_done()]
+	while running:
+		running = [search for search in running if not search.step(step_nodes)]
+		if deadline is not None and time.time() >= deadline:
+			break
+	return running
+
+
+def stepped_alpha_beta_search(board, depth, increment, step_nodes=1000,
+	**kwargs):
+	"""
+	Do an alpha-beta search with an AlphaBetaSearch, step_nodes nodes at a
+	time, and return the column it finds, like alpha_beta_search with the
+	same arguments.
+	"""
+	search = AlphaBetaSearch(board, depth, increment, **kwargs)
+	search.run(step_nodes=step_nodes)
+	return search.get_column()
+
+
+def compare_with_recursive(board, depth, step_nodes=1000, **kwargs):
+	"""
+	Search board to depth with alpha_beta_search and AlphaBetaSearch.
+	Return the columns, node counts and nodes per second of both searches,
+	as two (column, nodes, nodes per second) tuples.
+	"""
+	results = []
+	for search in (basicplayer.alpha_beta_search, stepped_alpha_beta_search):
+		search_kwargs = dict(kwargs)
+		if search is stepped_alpha_beta_search:
+			search_kwargs['step_nodes'] = step_nodes
+		stats = searchstats.SearchStats()
+		column = search(board, depth, False, stats=stats, **search_kwargs)
+		results.append((column, stats.get_nodes_expanded(),
+			stats.get_nodes_per_second()))
+	return results
+
+
+# Compare searches of a few positions with both implementations.
+if __name__ == '__main__':
+
+	depth = int(sys.argv[1]) if len(sys.argv) > 1 else 6
+	board = connectfour.ConnectFourBoard()
+	for column in (3, 3, 2, 4, 4, 2):
+		board = board.do_move(column)
+		recursive, stepped = compare_with_recursive(board, depth)
+		print('%d tokens: recursive column %s, %d nodes, %.0f nodes/sec; '
+			'stepped column %s, %d nodes, %.0f nodes/sec' % (
+			board.num_tokens_on_board(), recursive[0], recursive[1], recursive[2],
+			stepped[0], stepped[1], stepped[2]))
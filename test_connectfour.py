@@ -0,0 +1,52 @@
+"""
+Tests for boards of other sizes in worker processes.
+
+	python -m unittest test_connectfour
+"""
+
+import pickle
+import unittest
+import connectfour
+import basicplayer
+import tournament
+
+
+class SizedBoardPicklingTest(unittest.TestCase):
+	"""Check that the boards of make_board_class work across processes."""
+
+	def test_pickle_class(self):
+		"""A sized board class unpickles as the same class."""
+		for base in (connectfour.ConnectFourBoard,
+			connectfour.BitboardConnectFourBoard):
+			board_class = connectfour.make_board_class(8, 7, base)
+			self.assertIs(pickle.loads(pickle.dumps(board_class)), board_class)
+
+	def test_pickle_board(self):
+		"""A sized board unpickles as an equal board of the same class."""
+		for base in (connectfour.ConnectFourBoard,
+			connectfour.BitboardConnectFourBoard):
+			board_class = connectfour.make_board_class(8, 7, base)
+			board = board_class().do_move(3).do_move(7).do_move(3)
+			copy = pickle.loads(pickle.dumps(board))
+			self.assertIs(type(copy), board_class)
+			self.assertEqual(copy, board)
+			self.assertEqual(copy.position_key(), board.position_key())
+			self.assertEqual(copy.do_move(7).do_move(3).longest_chain(1), 3)
+
+	def test_unknown_name(self):
+		"""Names that are not board classes are still missing."""
+		self.assertRaises(AttributeError, getattr, connectfour, 'Board8x7')
+		self.assertRaises(AttributeError, getattr, connectfour,
+			'ConnectFourBoard8xy')
+
+	def test_tournament_in_processes(self):
+		"""A tournament on 8x7 boards runs in a pool of processes."""
+		roster = [('random', basicplayer.random_player),
+			('alpha_beta', basicplayer.alpha_beta_player)]
+		result = tournament.run_tournament(roster, games_per_pairing=2,
+			board_class=connectfour.make_board_class(8, 7), processes=2)
+		self.assertEqual(result.num_games, 2)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,336 @@
+"""
+Tournaments between Connect Four players.
+
+Every pair of players in a roster plays a number of games against each
+other, spread across a pool of worker processes. Games start from seeded
+random openings, and each opening is played twice with the colors swapped,
+so neither player gets the better side of an opening. Nothing is printed
+while the games are played; the result is a table of wins, losses and draws,
+Elo ratings estimated from it, and the search statistics of every player.
+
+The same seed always gives the same openings and the same random moves, so
+the results are reproducible as long as the players do not depend on time
+(as the players from basicplayer.make_timed_player do):
+
+	python tournament.py --games 20 --seed 537
+"""
+
+import argparse
+import math
+import multiprocessing
+import random
+import sys
+import time
+import connectfour
+import basicplayer
+import runner
+import searchstats
+
+# The roster of the worker processes, as a list of (name, callback) pairs.
+# Each worker process gets it from run_tournament when it starts, so that
+# callbacks that cannot be pickled (such as closures) can still be used on
+# platforms where worker processes are forked.
+_roster = None
+
+
+def _init_worker(roster):
+	"""Initialize a worker process of a tournament."""
+	global _roster
+	_roster = roster
+
+
+def get_pool_context():
+	"""
+	Return the multiprocessing context for pools of worker processes:
+	fork where possible, since workers then start quickly and inherit
+	callbacks that cannot be pickled, and the default context elsewhere.
+	"""
+	if 'fork' in multiprocessing.get_all_start_methods():
+		return multiprocessing.get_context('fork')
+	return multiprocessing.get_context()
+
+
+def make_default_roster():
+	"""Return the default roster of a tournament, as (name, callback) pairs."""
+	return [
+		('basic', basicplayer.basic_player),
+		('new', basicplayer.new_player),
+		('alpha_beta', basicplayer.alpha_beta_player),
+		('alpha_beta_tt', basicplayer.make_alpha_beta_player()),
+		('random', basicplayer.random_player),
+	]
+
+
+def make_opening(rng, num_moves, board_class=connectfour.ConnectFourBoard):
+	"""
+	Return a list of num_moves random columns to play that do not end
+	the game.
+	"""
+	while True:
+		board = board_class()
+		moves = []
+		while len(moves) < num_moves:
+			columns = [column for column in range(board.board_width)
+				if board.get_top_of_column(column) >= 0]
+			# rng.random() gives the same sequence on every Python version,
+			# unlike rng.choice()
+			column = columns[int(rng.random() * len(columns))]
+			board = board.do_move(column)
+			moves.append(column)
+			if board.is_game_over():
+				break
+		else:
+			return moves
+
+
+class _ForfeitObserver(runner.GameObserver):
+	"""A GameObserver that ends the game when a player makes an illegal move."""
+
+	def on_invalid_move(self, player_id, exception):
+		"""Raise the exception again."""
+		raise exception
+
+
+def play_game(player1_callback, player2_callback, opening=(), seed=None,
+	board_class=connectfour.ConnectFourBoard):
+	"""
+	Play a game of Connect Four without printing anything, starting with
+	the columns in opening. Player 1 makes the first move of the opening.
+	If seed is not None, the random module is seeded with it first.
+	Return the GameResult of the game, whose moves do not include the opening.
+
+	A player that attempts an illegal move loses the game.
+	"""
+	if seed is not None:
+		random.seed(seed)
+	board = board_class()
+	for column in opening:
+		board = board.do_move(column)
+	game = runner.ConnectFourRunner(player1_callback, player2_callback,
+		board, observers=[_ForfeitObserver()])
+	return game.run_game()
+
+
+def _play_tournament_game(task):
+	"""
+	Play one game of a tournament in a worker process.
+	Return the task with the result of play_game added.
+	"""
+	index, first, second, opening, seed, board_class = task
+	result = play_game(_roster[first][1], _roster[second][1], opening, seed,
+		board_class)
+	return index, first, second, result
+
+
+class TournamentResult(object):
+	"""Store the results of a tournament."""
+
+	def __init__(self, names):
+		"""Create a new TournamentResult for players with the specified names."""
+		self.names = list(names)
+		n = len(self.names)
+		# wins[i][j] is the number of games player i won against player j
+		self.wins = [[0] * n for i in range(n)]
+		# draws[i][j] is the number of games player i drew against player j
+		self.draws = [[0] * n for i in range(n)]
+		self.stats = [searchstats.SearchStats() for i in range(n)]
+		self.move_times = [[] for i in range(n)]
+		self.num_games = 0
+		self.num_moves = 0
+		self.elapsed = 0.0
+
+	def add_game(self, first, second, result):
+		"""
+		Add the GameResult of a game between the players at indexes first
+		(player 1) and second (player 2) in the roster.
+		"""
+		if result.winner == 1:
+			self.wins[first][second] += 1
+		elif result.winner == 2:
+			self.wins[second][first] += 1
+		else:
+			self.draws[first][second] += 1
+			self.draws[second][first] += 1
+		for player, player_id in ((first, 1), (second, 2)):
+			self.stats[player].merge(result.stats[player_id])
+			self.move_times[player].extend(result.get_move_times(player_id))
+		self.num_games += 1
+		self.num_moves += len(result.moves)
+
+	def get_games(self, i, j=None):
+		"""
+		Return the number of games player i played against player j,
+		or against every other player if j is None.
+		"""
+		if j is None:
+			return sum(self.get_games(i, j) for j in range(len(self.names)))
+		return self.wins[i][j] + self.wins[j][i] + self.draws[i][j]
+
+	def get_score(self, i):
+		"""Return the points of player i: 1 for each win and 0.5 for each draw."""
+		return sum(self.wins[i]) + 0.5 * sum(self.draws[i])
+
+	def get_elo_ratings(self, mean=1500.0, iterations=1000):
+		"""
+		Return a list of the Elo ratings of the players, estimated from the
+		results by maximum likelihood, with the mean rating at mean.
+
+		Every pair of players that met is given one extra draw, so that a
+		player who won or lost every game still gets a finite rating.
+		"""
+		n = len(self.names)
+		played = [[self.get_games(i, j) + 1 if i != j and self.get_games(i, j)
+			else 0 for j in range(n)] for i in range(n)]
+		scores = [sum(self.wins[i][j] + 0.5 * self.draws[i][j] + 0.5
+			for j in range(n) if played[i][j]) for i in range(n)]
+		# Bradley-Terry strengths, fitted with the minorization-maximization
+		# algorithm; a player with strength s has an Elo rating of
+		# 400 * log10(s) plus a constant
+		strengths = [1.0] * n
+		for iteration in range(iterations):
+			new_strengths = []
+			for i in range(n):
+				denominator = sum(float(played[i][j]) / (strengths[i] + strengths[j])
+					for j in range(n) if played[i][j])
+				new_strengths.append(scores[i] / denominator if denominator
+					else strengths[i])
+			strengths = new_strengths
+		ratings = [400 * math.log10(strength) for strength in strengths]
+		offset = mean - sum(ratings) / n if n else 0.0
+		return [rating + offset for rating in ratings]
+
+	def get_move_time(self, i):
+		"""Return the average number of seconds player i took per move."""
+		if not self.move_times[i]:
+			return 0.0
+		return sum(self.move_times[i]) / len(self.move_times[i])
+
+	def format_table(self):
+		"""Return a printable table of the wins, losses and draws."""
+		width = max([len(name) for name in self.names] + [8])
+		lines = [' ' * width + ''.join(' %*s' % (width, name)
+			for name in self.names) + ' %8s %6s' % ('W-L-D', 'score')]
+		for i, name in enumerate(self.names):
+			cells = []
+			for j in range(len(self.names)):
+				if i == j:
+					cells.append(' %*s' % (width, '-'))
+				else:
+					cells.append(' %*s' % (width, '%d-%d-%d' % (self.wins[i][j],
+						self.wins[j][i], self.draws[i][j])))
+			lines.append('%-*s%s %8s %6.1f' % (width, name, ''.join(cells),
+				'%d-%d-%d' % (sum(self.wins[i]), sum(row[i] for row in self.wins),
+				sum(self.draws[i])), self.get_score(i)))
+		return '\n'.join(lines)
+
+	def format_ratings(self):
+		"""Return a printable table of the Elo ratings and search statistics."""
+		width = max([len(name) for name in self.names] + [6])
+		lines = ['%-*s %6s %12s %12s %10s %10s' % (width, 'player', 'elo',
+			'nodes', 'nodes/sec', 'ms/move', 'max ms')]
+		ratings = self.get_elo_ratings()
+		for i in sorted(range(len(self.names)), key=lambda i: -ratings[i]):
+			lines.append('%-*s %6.0f %12d %12.0f %10.2f %10.2f' % (width,
+				self.names[i], ratings[i], self.stats[i].get_nodes_expanded(),
+				self.stats[i].get_nodes_per_second(), self.get_move_time(i) * 1000,
+				max(self.move_times[i] or [0.0]) * 1000))
+		return '\n'.join(lines)
+
+	def __str__(self):
+		"""Return a printable report of this tournament."""
+		return '%s\n\n%s\n\n%d games, %d moves, %.1fs' % (self.format_table(),
+			self.format_ratings(), self.num_games, self.num_moves, self.elapsed)
+
+	def __repr__(self):
+		"""Return a string representation of this tournament."""
+		return 'TournamentResult(%d players, %d games)' % (len(self.names),
+			self.num_games)
+
+
+def make_tasks(num_players, games_per_pairing, seed, opening_moves,
+	board_class=connectfour.ConnectFourBoard):
+	"""
+	Return a list of the games of a tournament, as tuples of a game index,
+	the indexes of the first and second player, the opening and a seed.
+	Consecutive games of a pairing share an opening, with the colors swapped.
+	"""
+	rng = random.Random(seed)
+	openings = [make_opening(rng, opening_moves, board_class)
+		for i in range((games_per_pairing + 1) // 2)]
+	tasks = []
+	for i in range(num_players):
+		for j in range(i + 1, num_players):
+			for game in range(games_per_pairing):
+				first, second = (i, j) if game % 2 == 0 else (j, i)
+				tasks.append((len(tasks), first, second, openings[game // 2],
+					int(rng.random() * 2**31), board_class))
+	return tasks
+
+
+def run_tournament(roster=None, games_per_pairing=10, seed=537,
+	opening_moves=2, processes=None, board_class=connectfour.ConnectFourBoard):
+	"""
+	Play games_per_pairing games between every pair of players in roster,
+	a list of (name, callback) pairs, in a pool of processes worker
+	processes (by default one per CPU, or none if processes is 1).
+	Return a TournamentResult.
+	"""
+	if roster is None:
+		roster = make_default_roster()
+	start = time.time()
+	tasks = make_tasks(len(roster), games_per_pairing, seed, opening_moves,
+		board_class)
+	result = TournamentResult([name for name, callback in roster])
+	if processes == 1:
+		_init_worker(roster)
+		games = list(map(_play_tournament_game, tasks))
+	else:
+		pool = get_pool_context().Pool(processes, _init_worker, (roster,))
+		try:
+			# imap keeps the games in order, so the results add up the same
+			games = list(pool.imap(_play_tournament_game, tasks))
+		finally:
+			pool.terminate()
+			pool.join()
+	for index, first, second, game_result in games:
+		result.add_game(first, second, game_result)
+	result.elapsed = time.time() - start
+	return result
+
+
+def main(argv=None):
+	"""Run a tournament from the command line."""
+	roster = make_default_roster()
+	names = [name for name, callback in roster]
+	parser = argparse.ArgumentParser(description='Run a Connect Four tournament.')
+	parser.add_argument('players', nargs='*', metavar='player',
+		help='players to include (default: %s)' % ', '.join(names))
+	parser.add_argument('--games', type=int, default=10,
+		help='number of games per pair of players')
+	parser.add_argument('--seed', type=int, default=537,
+		help='seed of the openings and random moves')
+	parser.add_argument('--opening-moves', type=int, default=2,
+		help='number of random moves at the start of each game')
+	parser.add_argument('--processes', type=int, default=None,
+		help='number of worker processes (default: one per CPU)')
+	parser.add_argument('--bitboard', action='store_true',
+		help='use the bitboard implementation')
+	args = parser.parse_args(argv)
+
+	for name in args.players:
+		if name not in names:
+			parser.error('unknown player: %s' % name)
+	if args.players:
+		roster = [(name, callback) for name, callback in roster
+			if name in args.players]
+	if args.bitboard:
+		board_class = connectfour.BitboardConnectFourBoard
+	else:
+		board_class = connectfour.ConnectFourBoard
+	print(run_tournament(roster, args.games, args.seed, args.opening_moves,
+		args.processes, board_class))
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
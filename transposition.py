@@ -0,0 +1,152 @@
+
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+# 2**64 divided by the golden ratio, used to spread keys across table slots
+_KEY_MULTIPLIER = 11400714819323198485
+_KEY_MASK = 2**64 - 1
+
+
+class TranspositionEntry(object):
+	"""Store the result of searching one position."""
+
+	__slots__ = ('key', 'depth', 'score', 'bound', 'move', 'generation')
+
+	def __init__(self, key, depth, score, bound, move, generation):
+		"""Initialize this transposition table entry."""
+		self.key = key
+		self.depth = depth
+		self.score = score
+		self.bound = bound
+		self.move = move
+		self.generation = generation
+
+	def __str__(self):
+		"""Return a printable string representation of this entry."""
+		return 'TranspositionEntry(%s, %s, %s, %s)' % (str(self.score),
+			('EXACT', 'LOWER', 'UPPER')[self.bound], self.depth, self.move)
+
+	def __repr__(self):
+		"""Return a string representation of this entry."""
+		return str(self)
+
+
+class TranspositionTable(object):
+	"""
+	Store search results for positions that have already been searched.
+
+	The table has a fixed number of slots. Each position is stored in the
+	slot given by its key (the position key plus the side to move), and a new
+	entry replaces the old one in its slot if the slot is empty, the old
+	entry was stored during an earlier search, or the old entry was searched
+	to a depth no greater than the new one.
+
+	Each entry holds the depth it was searched to, its score, whether that
+	score is EXACT, a LOWER_BOUND or an UPPER_BOUND, and the best move.
+
+	Entries hold the whole key, so a lookup only finds the entry of the
+	same position. Lookups update three counters: hits (the position was
+	found), misses (it was not found) and collisions (the subset of misses
+	where the slot held a different position).
+
+	If symmetric is True, a position and its mirror image share one entry,
+	keyed by the board's canonical key. The best move is stored as it would
+	be on the board with that key, and mirrored back when it is looked up
+	from the mirror image.
+	"""
+
+	def __init__(self, size=2**16, symmetric=False):
+		"""Create a new TranspositionTable with the specified number of slots."""
+		if size < 1:
+			raise ValueError('A transposition table needs at least 1 slot, not %d' %
+				size)
+		self._size = size
+		self.symmetric = symmetric
+		self._entries = [None] * size
+		self._generation = 0
+		self.hits = 0
+		self.misses = 0
+		self.collisions = 0
+
+	def __len__(self):
+		"""Return the number of positions stored in this table."""
+		return sum(1 for entry in self._entries if entry is not None)
+
+	def get_size(self):
+		"""Return the number of slots in this table."""
+		return self._size
+
+	def get_counters(self):
+		"""Return the hit, miss and collision counters as a tuple."""
+		return (self.hits, self.misses, self.collisions)
+
+	def key(self, board):
+		"""Return the key of a board, including the side to move."""
+		return self._key(board)[0]
+
+	def _key(self, board):
+		"""
+		Return the key of a board, and whether the board is the mirror image
+		of the position stored under the key.
+		"""
+		if self.symmetric:
+			key, mirrored = board.canonical_key_and_mirrored()
+		else:
+			key, mirrored = board.position_key(), False
+		return key << 1 | (board.get_current_player_id() == 2), mirrored
+
+	def _index(self, key):
+		"""
+		Return the slot for a key. Keys of similar positions differ mostly
+		in a few bits, so the key is mixed before taking it modulo the
+		table size.
+		"""
+		return (((key & _KEY_MASK) * _KEY_MULTIPLIER & _KEY_MASK) >> 32) % self._size
+
+	def new_search(self):
+		"""
+		Start a new search. Entries from earlier searches can still be
+		looked up, but are always replaced by newer ones.
+		"""
+		self._generation += 1
+
+	def clear(self):
+		"""Remove every entry and reset the counters."""
+		self._entries = [None] * self._size
+		self._generation = 0
+		self.hits = 0
+		self.misses = 0
+		self.collisions = 0
+
+	def lookup(self, board):
+		"""
+		Return the entry stored for the specified board.
+		Return None if it is not in the table.
+		"""
+		key, mirrored = self._key(board)
+		entry = self._entries[self._index(key)]
+		if entry is None:
+			self.misses += 1
+			return None
+		if entry.key != key:
+			self.misses += 1
+			self.collisions += 1
+			return None
+		self.hits += 1
+		if mirrored and entry.move is not None:
+			return TranspositionEntry(key, entry.depth, entry.score, entry.bound,
+				board.board_width - 1 - entry.move, entry.generation)
+		return entry
+
+	def store(self, board, depth, score, bound, move):
+		"""Store the result of searching the specified board."""
+		key, mirrored = self._key(board)
+		if mirrored and move is not None:
+			move = board.board_width - 1 - move
+		index = self._index(key)
+		entry = self._entries[index]
+		if (entry is None or entry.generation != self._generation or
+			entry.depth <= depth):
+			self._entries[index] = TranspositionEntry(key, depth, score, bound,
+				move, self._generation)
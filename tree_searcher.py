@@ -1,6 +1,8 @@
-import lab3
+import sys
+from array import array
+import basicplayer
 
-search = lab3.basicplayer.alpha_beta_search # or minimax
+search = basicplayer.alpha_beta_search # or minimax
 
 
 class Node(object):
@@ -95,22 +97,257 @@ def is_leaf(node):
 	return node.num_children() == 0
 
 
+class FlatTree(object):
+	"""
+	A game tree stored as parallel arrays, indexed by node number.
+
+	Each node has:
+	* labels[node]: its label
+	* values[node]: its value, or None
+	* depths[node]: its depth; nodes at even depths are MAX nodes and
+	  nodes at odd depths are MIN nodes
+	* first_child[node] and child_count[node]: the number of its first
+	  child and how many children it has
+
+	The children of every node have consecutive numbers, so a node's
+	children are the nodes from first_child[node] up to first_child[node] +
+	child_count[node]. Children are numbered before their parent, and the
+	root is the last node.
+
+	A node is just its number, so searching the tree creates no objects
+	per node. Search a tree with its eval_fn, get_next_moves and is_leaf
+	methods as the hooks of minimax or alpha_beta_search, starting from
+	the root:
+
+		search(tree.root, depth, False, eval_fn=tree.eval_fn,
+			get_next_moves_fn=tree.get_next_moves, is_terminal_fn=tree.is_leaf)
+	"""
+
+	def __init__(self):
+		"""Create a new, empty FlatTree."""
+		self.root = None
+		self.labels = []
+		self.values = []
+		self.depths = array('i')
+		self.first_child = array('l')
+		self.child_count = array('l')
+
+	@classmethod
+	def from_tuple(cls, tup):
+		"""Return a FlatTree of a tuple formatted tree."""
+		return cls.from_nodes(iter_tuple_nodes(tup))
+
+	@classmethod
+	def from_nodes(cls, nodes):
+		"""
+		Return a FlatTree of the nodes from an iterable of (depth, label,
+		value) triples in depth-first order, as given by iter_tuple_nodes
+		and iter_tree_file.
+
+		A node is added to the tree once all of its siblings have been read,
+		so apart from the tree, only the nodes on the path to the latest node
+		and their children are kept in memory.
+		"""
+		tree = cls()
+		# The label, value, depth and finished children of each node on the
+		# path to the latest one
+		path = []
+		started = False
+		for depth, label, value in nodes:
+			if depth > len(path) or (started and not depth):
+				raise ValueError('Node %s at depth %d does not fit in the tree' %
+					(label, depth))
+			started = True
+			while len(path) > depth:
+				node = tree._close(path)
+				path[-1][3].append(node)
+			path.append((label, value, depth, []))
+		if not path:
+			raise ValueError('The tree has no nodes')
+		while len(path) > 1:
+			node = tree._close(path)
+			path[-1][3].append(node)
+		tree.root = tree._add_nodes([tree._close(path)])
+		return tree
+
+	def _add_nodes(self, nodes):
+		"""
+		Add nodes with consecutive numbers, from a list of (label, value,
+		depth, first child, child count) tuples. Return the number of the
+		first one.
+		"""
+		first = len(self.labels)
+		for label, value, depth, first_child, child_count in nodes:
+			self.labels.append(label)
+			self.values.append(value)
+			self.depths.append(depth)
+			self.first_child.append(first_child)
+			self.child_count.append(child_count)
+		return first
+
+	def _close(self, path):
+		"""
+		Remove the last node from path and add its children to the tree.
+		Return the node as a tuple for _add_nodes.
+		"""
+		label, value, depth, children = path.pop()
+		return label, value, depth, self._add_nodes(children), len(children)
+
+	def __len__(self):
+		"""Return the number of nodes in this tree."""
+		return len(self.labels)
+
+	def get_node_type(self, node):
+		"""Return 'MAX' or 'MIN', the type of the specified node."""
+		return 'MIN' if self.depths[node] % 2 else 'MAX'
+
+	def get_children(self, node):
+		"""Return the numbers of the children of the specified node."""
+		first = self.first_child[node]
+		return range(first, first + self.child_count[node])
+
+	def eval_fn(self, node):
+		"""
+		'eval_fn' for flat tree nodes.
+		Return the static value of a node.
+		"""
+		value = self.values[node]
+		if value is None or not self.depths[node] % 2:
+			return value
+		return -value
+
+	def get_next_moves(self, node):
+		"""
+		'get_next_moves_fn' for flat tree nodes.
+		Return an iterator of the next moves for traversing the tree.
+		"""
+		first = self.first_child[node]
+		end = first + self.child_count[node]
+		return zip(self.labels[first:end], range(first, end))
+
+	def is_leaf(self, node):
+		"""
+		'is_terminal_fn' for flat tree nodes.
+		Return whether a node is a leaf node.
+		"""
+		return not self.child_count[node]
+
+	def as_tree_string(self, node=None):
+		"""
+		Return a string representation of a node, by default the root,
+		and its descendants.
+		"""
+		if node is None:
+			node = self.root
+		lines = []
+		top_depth = self.depths[node]
+		stack = [node]
+		while stack:
+			node = stack.pop()
+			lines.append('%s%s:%s' % ('  ' * (self.depths[node] - top_depth),
+				self.labels[node], self.eval_fn(node)))
+			stack.extend(reversed(self.get_children(node)))
+		return '\n'.join(lines)
+
+	def write(self, f):
+		"""Write this tree to a file object in the format of iter_tree_file."""
+		stack = [self.root]
+		while stack:
+			node = stack.pop()
+			value = self.values[node]
+			f.write('%s%s%s\n' % ('  ' * self.depths[node], self.labels[node],
+				'' if value is None else ' %r' % value))
+			stack.extend(reversed(self.get_children(node)))
+
+
+def iter_tuple_nodes(tup):
+	"""
+	Return an iterator of the (depth, label, value) triples of the nodes of
+	a tuple formatted tree, in depth-first order.
+	"""
+	stack = [(0, tup)]
+	while stack:
+		depth, tup = stack.pop()
+		yield depth, tup[0], tup[1]
+		stack.extend((depth + 1, child_tup) for child_tup in reversed(tup[2:]))
+
+def iter_tree_file(f):
+	"""
+	Return an iterator of the (depth, label, value) triples of the nodes of
+	a tree read from a file object, one line at a time.
+
+	The file has one line per node, in depth-first order. Each line is
+	indented by two spaces per level of depth, and holds the node's label
+	followed by its value, if it has one. Empty lines and lines starting
+	with '#' are skipped. For example:
+
+		A
+		  B
+		    C 2
+		    D 4
+		  E 3
+	"""
+	for line_number, line in enumerate(f, 1):
+		text = line.strip()
+		if not text or text.startswith('#'):
+			continue
+		indent = len(line) - len(line.lstrip(' '))
+		if indent % 2:
+			raise ValueError('Line %d is not indented by a multiple of 2 spaces' %
+				line_number)
+		fields = text.split()
+		if len(fields) > 2:
+			raise ValueError('Line %d has more than a label and a value' %
+				line_number)
+		value = None
+		if len(fields) == 2:
+			try:
+				value = float(fields[1])
+			except ValueError:
+				raise ValueError('Line %d has a value that is not a number' %
+					line_number)
+			if value.is_integer():
+				value = int(value)
+		yield indent // 2, fields[0], value
+
+def load_tree(path):
+	"""Read a FlatTree from the file at path without reading it all at once."""
+	with open(path) as f:
+		return FlatTree.from_nodes(iter_tree_file(f))
+
+
 def test_tree(name, expected, tup_tree):
-	tree_node = make_tree(tup_tree)
-	print name + ':'
-	print tree_node.as_tree_string()
-	best_move = search(tree_node, depth=10, increment=False,
-		eval_fn=tree_eval,
-		get_next_moves_fn=tree_get_next_moves,
-		is_terminal_fn=is_leaf)
-	print 'BEST MOVE:', best_move
-	print 'EXPECTED:', expected
-	print
-
-
-# Run basic tests using trees.
+	tree = FlatTree.from_tuple(tup_tree)
+	print(name + ':')
+	print(tree.as_tree_string())
+	best_move = search(tree.root, depth=10, increment=False,
+		eval_fn=tree.eval_fn,
+		get_next_moves_fn=tree.get_next_moves,
+		is_terminal_fn=tree.is_leaf)
+	print('BEST MOVE:', best_move)
+	print('EXPECTED:', expected)
+	print()
+
+def search_tree_file(path):
+	"""Load the tree in the file at path and print the best move of its root."""
+	tree = load_tree(path)
+	best_move = search(tree.root, depth=max(tree.depths), increment=False,
+		eval_fn=tree.eval_fn,
+		get_next_moves_fn=tree.get_next_moves,
+		is_terminal_fn=tree.is_leaf)
+	print('%s: %d nodes' % (path, len(tree)))
+	print('BEST MOVE:', best_move)
+
+
+# Run basic tests using trees, or search the trees in the files given on the
+# command line.
 if __name__ == '__main__':
 
+	if len(sys.argv) > 1:
+		for path in sys.argv[1:]:
+			search_tree_file(path)
+		sys.exit()
+
 	test_tree('TREE_1', 'I',
 		('A', None,
 			('B', None,